@@ -0,0 +1,30 @@
+import sys
+from romania_map import romania_map
+from SimpleProblemSolvingAgent import Landmarks
+##############################################################################
+# This file runs the offline landmark preprocessing for the romania_map graph.
+# It selects landmark cities spread over the map, computes the exact shortest path cost from
+# every landmark to every city, and outputs them to RomaniaLandmarks.json.
+# Load the file with Landmarks.load and attach it with romania_map.use_landmarks to make
+# A* use the landmark (ALT) bounds alongside the haversine heuristic.
+##############################################################################
+# Usage: python3 CalcLandmarks.py [number of landmarks] [output file]
+##############################################################################
+# Main function - This function is the entry point of the program.
+##############################################################################
+def main():
+    # number of landmarks and output file, from the command line if given
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    filename = sys.argv[2] if len(sys.argv) > 2 else "RomaniaLandmarks.json"
+
+    # select the landmarks and compute their shortest path costs
+    landmarks = Landmarks.build(romania_map, k)
+
+    # write the landmarks to the output file
+    landmarks.save(filename)
+    print("Landmarks: ", ", ".join(str(landmark) for landmark in landmarks.landmarks))
+    print("Saved to ", filename)
+##############################################################################
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,303 @@
+import sys
+import json
+from SimpleProblemSolvingAgent import PriorityQueue, CountingPriorityQueue
+
+############################################################################################################
+# This file contains the ContractionHierarchy class which preprocesses a graph into a contraction
+# hierarchy and answers shortest path queries on it.
+#
+# Preprocessing contracts the nodes one at a time, least important first. Contracting a node removes it
+# from the remaining graph and adds a shortcut edge u → w (remembering the node it skips) for each pair
+# of remaining neighbors whose only shortest path ran through it. The order a node was contracted in is
+# its rank.
+#
+# A query runs Dijkstra forward from the start city and backward from the goal city, each only following
+# edges towards higher ranked nodes. The two searches meet at the highest ranked node of the shortest
+# path, so each explores a tiny part of the graph. Shortcuts on the found path are then unpacked back
+# into the original edges.
+#
+# Run this file to build the hierarchy of romania_map and save it to RomaniaHierarchy.json.
+############################################################################################################
+
+
+############################################################################################################
+# ContractionHierarchy class
+############################################################################################################
+
+class ContractionHierarchy:
+    # constructor takes the node list, their ranks, the upward edges and the shortcut middle nodes
+    # up_out[i] lists (j, cost) edges i → j and up_in[i] lists (j, cost) edges j → i, both only to higher ranked j
+    # middle maps a shortcut (i, j) to the node it skips, nodes are referred to by their index in nodes
+    def __init__(self, nodes, rank, up_out, up_in, middle):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.rank = rank
+        self.up_out = up_out
+        self.up_in = up_in
+        self.middle = middle
+        # version of the graph the hierarchy was built from, None when it was loaded from a file
+        self.graph_version = None
+
+    ############################################################################################################
+    # Preprocessing
+    ############################################################################################################
+
+    # method to build the contraction hierarchy of a graph
+    # witness searches settle at most witness_limit nodes, a smaller limit preprocesses faster but adds more shortcuts
+    @classmethod
+    def build(cls, graph, witness_limit=500):
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        n = len(nodes)
+
+        # edges of the remaining (not yet contracted) graph, keeping the cheapest of parallel edges
+        out_edges = [{} for i in range(n)]
+        in_edges = [{} for i in range(n)]
+        for node in nodes:
+            a = index[node]
+            for next, cost in graph.edges(node):
+                b = index[next]
+                if a != b and (b not in out_edges[a] or cost < out_edges[a][b]):
+                    out_edges[a][b] = cost
+                    in_edges[b][a] = cost
+
+        middle = {}
+        rank = [0] * n
+        up_out = [None] * n
+        up_in = [None] * n
+        contracted_neighbors = [0] * n
+
+        # finds the shortcuts needed to contract node v
+        def shortcuts(v):
+            needed = []
+            for u, cost_in in in_edges[v].items():
+                targets = {w: cost_in + cost_out for w, cost_out in out_edges[v].items() if w != u}
+                if not targets:
+                    continue
+                distances = witness_search(u, v, targets, max(targets.values()))
+                for w, via_cost in targets.items():
+                    if distances.get(w, float('inf')) > via_cost:
+                        needed.append((u, w, via_cost))
+            return needed
+
+        # bounded Dijkstra from u in the remaining graph that avoids v
+        def witness_search(u, v, targets, max_cost):
+            frontier = PriorityQueue()
+            frontier.put(u, 0)
+            cost_so_far = {u: 0}
+            remaining = len(targets)
+            settled = 0
+            while not frontier.empty() and remaining and settled < witness_limit:
+                current, cost = frontier.pop()
+                if cost > max_cost:
+                    break
+                settled += 1
+                if current in targets:
+                    remaining -= 1
+                for next, step_cost in out_edges[current].items():
+                    new_cost = cost + step_cost
+                    if next != v and (next not in cost_so_far or new_cost < cost_so_far[next]):
+                        cost_so_far[next] = new_cost
+                        frontier.put(next, new_cost)
+            return cost_so_far
+
+        # importance of a node: shortcuts added minus edges removed, plus already contracted neighbors
+        def priority(v, needed):
+            return len(needed) - len(in_edges[v]) - len(out_edges[v]) + contracted_neighbors[v]
+
+        order = PriorityQueue()
+        for v in range(n):
+            order.put(v, priority(v, shortcuts(v)))
+
+        level = 0
+        while not order.empty():
+            v = order.get()
+            needed = shortcuts(v)
+
+            # lazy update, put the node back if its priority went up since it was queued
+            if not order.empty():
+                new_priority = priority(v, needed)
+                if new_priority > order.peek()[1]:
+                    order.put(v, new_priority)
+                    continue
+
+            # add the shortcuts, remembering the contracted node they skip
+            for u, w, cost in needed:
+                if w not in out_edges[u] or cost < out_edges[u][w]:
+                    out_edges[u][w] = cost
+                    in_edges[w][u] = cost
+                    middle[(u, w)] = v
+
+            # the remaining edges of v all lead to higher ranked nodes
+            rank[v] = level
+            level += 1
+            up_out[v] = list(out_edges[v].items())
+            up_in[v] = list(in_edges[v].items())
+
+            # remove v from the remaining graph
+            for w in out_edges[v]:
+                del in_edges[w][v]
+                contracted_neighbors[w] += 1
+            for u in in_edges[v]:
+                del out_edges[u][v]
+                contracted_neighbors[u] += 1
+            out_edges[v] = {}
+            in_edges[v] = {}
+
+        hierarchy = cls(nodes, rank, up_out, up_in, middle)
+        hierarchy.graph_version = getattr(graph, 'version', 0)
+        return hierarchy
+
+    ############################################################################################################
+    # End of Preprocessing
+    ############################################################################################################
+
+
+    ############################################################################################################
+    # Query - bidirectional Dijkstra that only moves up the hierarchy
+    # Returns the path in the graph's own nodes and its cost, or an empty path with infinite cost
+    # when the goal cannot be reached. Pass a SearchStats as stats to record what the query did.
+    ############################################################################################################
+
+    def query(self, start_city, goal_city, stats=None):
+        start = self.index[start_city]
+        goal = self.index[goal_city]
+        if start == goal:
+            return [start_city], 0
+
+        if stats is None:
+            forward = PriorityQueue()
+            backward = PriorityQueue()
+        else:
+            forward = CountingPriorityQueue(stats)
+            backward = CountingPriorityQueue(stats)
+        forward.put(start, 0)
+        backward.put(goal, 0)
+        cost_from_start = {start: 0}
+        cost_to_goal = {goal: 0}
+        came_from = {start: None}
+        goes_to = {goal: None}
+        best_cost = float('inf')
+        meeting = None
+        if stats is not None:
+            stats.lap('setup')
+
+        # each search stops once its cheapest queued node costs more than the best path found so far
+        while not forward.empty() or not backward.empty():
+            if not forward.empty() and forward.peek()[1] >= best_cost:
+                forward = PriorityQueue()
+            if not backward.empty() and backward.peek()[1] >= best_cost:
+                backward = PriorityQueue()
+            if stats is not None:
+                stats.frontier = len(forward) + len(backward)
+
+            for frontier, costs, parents, other_costs, edges in (
+                (forward, cost_from_start, came_from, cost_to_goal, self.up_out),
+                (backward, cost_to_goal, goes_to, cost_from_start, self.up_in),
+            ):
+                if frontier.empty():
+                    continue
+                current, cost = frontier.pop()
+                if stats is not None:
+                    stats.expanded += 1
+                if current in other_costs and cost + other_costs[current] < best_cost:
+                    best_cost = cost + other_costs[current]
+                    meeting = current
+                for next, step_cost in edges[current]:
+                    new_cost = cost + step_cost
+                    if next not in costs or new_cost < costs[next]:
+                        costs[next] = new_cost
+                        parents[next] = current
+                        frontier.put(next, new_cost)
+
+        if stats is not None:
+            stats.lap('search')
+
+        if meeting is None:
+            return [], float('inf')
+
+        # path of hierarchy edges from start to the meeting node and from the meeting node to goal
+        path = [meeting]
+        current = meeting
+        while came_from[current] is not None:
+            current = came_from[current]
+            path.append(current)
+        path.reverse()
+        current = meeting
+        while goes_to[current] is not None:
+            current = goes_to[current]
+            path.append(current)
+
+        return [self.nodes[i] for i in self.unpack(path)], best_cost
+
+    # method to replace every shortcut in a path of node indices by the original edges it stands for
+    def unpack(self, path):
+        unpacked = [path[0]]
+        for a, b in zip(path, path[1:]):
+            stack = [(a, b)]
+            while stack:
+                u, w = stack.pop()
+                v = self.middle.get((u, w))
+                if v is None:
+                    unpacked.append(w)
+                else:
+                    stack.append((v, w))
+                    stack.append((u, v))
+        return unpacked
+
+    ############################################################################################################
+    # End of Query
+    ############################################################################################################
+
+
+    ############################################################################################################
+    # Serialization
+    ############################################################################################################
+
+    # method to write the hierarchy to a JSON file
+    def save(self, filename):
+        data = {
+            'nodes': self.nodes,
+            'rank': self.rank,
+            'up_out': self.up_out,
+            'up_in': self.up_in,
+            'middle': [[u, w, v] for (u, w), v in self.middle.items()],
+        }
+        with open(filename, 'w') as file:
+            json.dump(data, file)
+
+    # method to read a hierarchy written by save
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as file:
+            data = json.load(file)
+        up_out = [[tuple(edge) for edge in edges] for edges in data['up_out']]
+        up_in = [[tuple(edge) for edge in edges] for edges in data['up_in']]
+        middle = {(u, w): v for u, w, v in data['middle']}
+        return cls(data['nodes'], data['rank'], up_out, up_in, middle)
+
+    ############################################################################################################
+    # End of Serialization
+    ############################################################################################################
+
+############################################################################################################
+# End of ContractionHierarchy class
+############################################################################################################
+
+
+############################################################################################################
+# Main function - builds the hierarchy of romania_map and saves it
+# Usage: python3 ContractionHierarchy.py [output file]
+############################################################################################################
+
+def main():
+    from romania_map import romania_map
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else "RomaniaHierarchy.json"
+    hierarchy = ContractionHierarchy.build(romania_map)
+    hierarchy.save(filename)
+    print("Shortcuts added: ", len(hierarchy.middle))
+    print("Saved to ", filename)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from SimpleProblemSolvingAgent import dijkstra
+
+############################################################################################################
+# This file contains the DistanceMatrix class which precomputes the shortest path cost and the next hop
+# between every pair of nodes of a graph, so routes can be looked up without searching.
+#
+# Rows are computed with one Dijkstra per source node, spread over a process pool, and streamed into a
+# binary file. The file is opened with mmap, so looking up a route only touches the pages it reads:
+#     cost(a, b) is one read, path(a, b) follows next hops and takes one read per edge of the path.
+#
+# File layout (little endian):
+#     header   - magic b'RMDM', version (uint32), number of nodes n (uint32), names length (uint64)
+#     names    - JSON list of the node names, padded to a multiple of 8 bytes
+#     costs    - n x n float64, costs[i * n + j] is the cost of the shortest path from node i to node j
+#     next hop - n x n int32, next_hop[i * n + j] is the node after i on that path (-1 if j is unreachable)
+#
+# Run this file to compute the matrix of romania_map and save it to RomaniaDistanceMatrix.bin.
+############################################################################################################
+
+MAGIC = b'RMDM'
+VERSION = 1
+HEADER = struct.Struct('<4sIIQ')
+
+
+############################################################################################################
+# Worker functions - run in the process pool, each worker gets its own copy of the graph once
+############################################################################################################
+
+worker_graph = None
+worker_nodes = None
+worker_index = None
+
+# sets the graph the worker computes rows for
+def init_worker(graph, nodes):
+    global worker_graph, worker_nodes, worker_index
+    worker_graph = graph
+    worker_nodes = nodes
+    worker_index = {node: i for i, node in enumerate(nodes)}
+
+# computes the cost and next hop rows of one source node, returned as bytes to keep pickling cheap
+def compute_row(source):
+    n = len(worker_nodes)
+    cost_so_far, came_from = dijkstra(worker_graph, worker_nodes[source])
+    costs = array('d', [float('inf')]) * n
+    next_hop = array('i', [-1]) * n
+    next_hop[source] = source
+
+    for node, cost in cost_so_far.items():
+        target = worker_index[node]
+        costs[target] = cost
+        if next_hop[target] != -1:
+            continue
+
+        # walk up the shortest path tree until a node whose next hop is known, then fill in the walked nodes
+        walked = []
+        while next_hop[target] == -1:
+            walked.append(target)
+            parent = worker_index[came_from[worker_nodes[target]][0]]
+            if parent == source:
+                next_hop[target] = target
+                walked.pop()
+                break
+            target = parent
+        hop = next_hop[target]
+        for i in walked:
+            next_hop[i] = hop
+
+    return costs.tobytes(), next_hop.tobytes()
+
+############################################################################################################
+# End of Worker functions
+############################################################################################################
+
+
+############################################################################################################
+# DistanceMatrix class
+############################################################################################################
+
+class DistanceMatrix:
+    # constructor takes the node names and the cost and next hop buffers (arrays or memoryviews)
+    def __init__(self, nodes, costs, next_hop, file=None, mapped=None):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.costs = costs
+        self.next_hop = next_hop
+        self.file = file
+        self.mapped = mapped
+        # version of the graph the matrix belongs to, set when it is first used (see distance_matrix_search)
+        self.graph_version = None
+        # whether the graph's costs are ints, the file stores them as float64 (also set on first use)
+        self.integer_costs = False
+
+    # method to compute the matrix of a graph and write it to filename, one Dijkstra per source node
+    # workers is the number of processes (None uses every core, 1 computes in this process)
+    @staticmethod
+    def build(graph, filename, workers=None):
+        nodes = sorted(graph.nodes(), key=str)
+        n = len(nodes)
+        names = json.dumps(nodes).encode('utf-8')
+        names += b' ' * (-len(names) % 8)
+        costs_offset = HEADER.size + len(names)
+        next_hop_offset = costs_offset + 8 * n * n
+
+        with open(filename, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, n, len(names)))
+            file.write(names)
+            file.truncate(next_hop_offset + 4 * n * n)
+
+            # write each row as soon as it is computed so the whole matrix is never held in memory
+            def write_rows(rows):
+                for i, (costs, next_hop) in enumerate(rows):
+                    file.seek(costs_offset + 8 * n * i)
+                    file.write(costs)
+                    file.seek(next_hop_offset + 4 * n * i)
+                    file.write(next_hop)
+
+            if workers == 1 or n < 2:
+                init_worker(graph, nodes)
+                write_rows(compute_row(i) for i in range(n))
+            else:
+                with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(graph, nodes)) as executor:
+                    write_rows(executor.map(compute_row, range(n), chunksize=max(1, n // (4 * (workers or os.cpu_count() or 1)))))
+
+    # method to open a matrix file, the cost and next hop tables are views into the memory mapped file
+    @classmethod
+    def open(cls, filename):
+        file = open(filename, 'rb')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n, names_length = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} distance matrix file")
+        nodes = json.loads(bytes(mapped[HEADER.size:HEADER.size + names_length]))
+        costs_offset = HEADER.size + names_length
+        next_hop_offset = costs_offset + 8 * n * n
+        view = memoryview(mapped)
+        costs = view[costs_offset:next_hop_offset].cast('d')
+        next_hop = view[next_hop_offset:next_hop_offset + 4 * n * n].cast('i')
+        return cls(nodes, costs, next_hop, file, mapped)
+
+    # method to close the memory mapped file
+    def close(self):
+        if self.mapped is not None:
+            self.costs.release()
+            self.next_hop.release()
+            self.mapped.close()
+            self.file.close()
+            self.mapped = None
+
+    # method to get the cost of the shortest path between two nodes
+    def cost(self, start_city, goal_city):
+        n = len(self.nodes)
+        cost = self.costs[self.index[start_city] * n + self.index[goal_city]]
+        if self.integer_costs and cost.is_integer():
+            return int(cost)
+        return cost
+
+    # method to get the shortest path between two nodes and its cost by following next hops
+    # returns an empty path with infinite cost when the goal cannot be reached
+    def path(self, start_city, goal_city):
+        n = len(self.nodes)
+        current = self.index[start_city]
+        goal = self.index[goal_city]
+        cost = self.cost(start_city, goal_city)
+        if cost == float('inf'):
+            return [], cost
+        path = [start_city]
+        while current != goal:
+            current = self.next_hop[current * n + goal]
+            path.append(self.nodes[current])
+        return path, cost
+
+############################################################################################################
+# End of DistanceMatrix class
+############################################################################################################
+
+
+############################################################################################################
+# Main function - computes the matrix of romania_map and saves it
+# Usage: python3 DistanceMatrix.py [output file] [number of worker processes]
+############################################################################################################
+
+def main():
+    from romania_map import romania_map
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else "RomaniaDistanceMatrix.bin"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    DistanceMatrix.build(romania_map, filename, workers)
+    print("Saved to ", filename)
+
+if __name__ == "__main__":
+    main()
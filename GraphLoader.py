@@ -0,0 +1,187 @@
+import csv
+import gzip
+import sys
+from array import array
+from itertools import islice
+from SimpleProblemSolvingAgent import Graph, CompactGraph
+
+############################################################################################################
+# This file contains loaders that stream graphs from edge list and node coordinate files, so large road
+# networks do not have to be written out as Python source like romania_map.py.
+#
+# Files are CSV (or TSV when the name ends in .tsv / .tsv.gz) and may be gzip compressed (.gz). They are
+# read chunk_size rows at a time and node names are interned as they are read, so memory holds the graph
+# being built and one chunk of rows, never the whole file.
+#
+#     edge list:    source,target[,cost]     (cost defaults to 1)
+#     coordinates:  node,latitude,longitude
+#
+# A first row whose cost (or latitude) column is not a number, or whose columns are all header names like
+# source,target or node,latitude,longitude (see HEADER_NAMES), is treated as a header and skipped. Pass
+# header=True or header=False to say whether there is one instead.
+#
+# Usage example:
+#     graph = load_edge_list("roads.csv.gz", compact=True)
+#     load_locations("nodes.csv.gz", graph)
+############################################################################################################
+
+
+############################################################################################################
+# Helper functions
+############################################################################################################
+
+# column names that mark the first row as a header when none of its columns has to be a number
+HEADER_NAMES = {'source', 'target', 'from', 'to', 'src', 'dst', 'start', 'end', 'node', 'id', 'name', 'city',
+                'cost', 'weight', 'distance', 'length', 'latitude', 'longitude', 'lat', 'lon', 'lng'}
+
+# opens a text file for csv reading, decompressing it if it is gzip compressed
+def open_text(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', newline='', encoding='utf-8')
+    return open(path, newline='', encoding='utf-8')
+
+# delimiter of a file from its name
+def file_delimiter(path, delimiter):
+    if delimiter is not None:
+        return delimiter
+    name = str(path)[:-3] if str(path).endswith('.gz') else str(path)
+    return '\t' if name.endswith('.tsv') else ','
+
+# reads the rows of a file in chunks of chunk_size rows, skipping blank lines and a header row
+# header is True or False when it is known whether the file has one, None detects it (see is_header)
+def read_chunks(path, delimiter=None, chunk_size=65536, number_column=None, header=None):
+    with open_text(path) as file:
+        reader = csv.reader(file, delimiter=file_delimiter(path, delimiter))
+        first = True
+        while True:
+            chunk = [row for row in islice(reader, chunk_size) if row]
+            if not chunk:
+                return
+            if first:
+                first = False
+                if header or (header is None and is_header(chunk[0], number_column)):
+                    chunk = chunk[1:]
+            yield chunk
+
+# checks whether the first row of a file is a header: a column that has to be a number is not one, or
+# every column is a known column name
+def is_header(row, number_column=None):
+    if number_column is not None and len(row) > number_column and not is_number(row[number_column]):
+        return True
+    return all(cell.strip().lower() in HEADER_NAMES for cell in row)
+
+# checks whether a string is a number
+def is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+# parses a cost, keeping whole numbers as integers like the costs in romania_map
+def parse_cost(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+############################################################################################################
+# End of Helper functions
+############################################################################################################
+
+
+############################################################################################################
+# Edge list loader
+# returns a Graph, or a CompactGraph with compact=True. A CompactGraph is built from flat id arrays
+# (about 16 bytes per edge) without ever creating the dict of dicts of a Graph.
+############################################################################################################
+
+def load_edge_list(path, directed=False, compact=False, source_column=0, target_column=1, cost_column=2, delimiter=None, chunk_size=65536, header=None):
+    # node name to id, names are interned so every edge refers to the same string object
+    ids = {}
+    names = []
+
+    def node_id(name):
+        node = ids.get(name)
+        if node is None:
+            name = sys.intern(name)
+            node = ids[name] = len(names)
+            names.append(name)
+        return node
+
+    if compact:
+        sources = array('i')
+        targets = array('i')
+        costs = array('d')
+    else:
+        graph_dict = {}
+
+    for chunk in read_chunks(path, delimiter, chunk_size, cost_column, header):
+        for row in chunk:
+            cost = parse_cost(row[cost_column]) if len(row) > cost_column and row[cost_column] != '' else 1
+            if compact:
+                a = node_id(row[source_column].strip())
+                b = node_id(row[target_column].strip())
+                sources.append(a)
+                targets.append(b)
+                costs.append(cost)
+                # an undirected graph stores both directions
+                if not directed:
+                    sources.append(b)
+                    targets.append(a)
+                    costs.append(cost)
+            else:
+                a = names[node_id(row[source_column].strip())]
+                b = names[node_id(row[target_column].strip())]
+                graph_dict.setdefault(a, {})[b] = cost
+
+    if compact:
+        return CompactGraph.from_edges(names, sources, targets, costs, directed=directed)
+
+    # nodes that only appear as targets still get an entry
+    for name in names:
+        graph_dict.setdefault(name, {})
+    return Graph(graph_dict, directed)
+
+############################################################################################################
+# End of Edge list loader
+############################################################################################################
+
+
+############################################################################################################
+# Coordinates loader
+# attaches the latitude and longitude of each node to a graph, as graph.locations for a Graph and as the
+# latitudes/longitudes arrays of a CompactGraph. Rows for nodes that are not in the graph are skipped.
+############################################################################################################
+
+def load_locations(path, graph, node_column=0, latitude_column=1, longitude_column=2, delimiter=None, chunk_size=65536, header=None):
+    if isinstance(graph, CompactGraph):
+        latitudes = array('d', [float('nan')]) * len(graph.names)
+        longitudes = array('d', [float('nan')]) * len(graph.names)
+        for chunk in read_chunks(path, delimiter, chunk_size, latitude_column, header):
+            for row in chunk:
+                try:
+                    node = graph.id_of(row[node_column].strip())
+                except KeyError:
+                    continue
+                latitudes[node] = float(row[latitude_column])
+                longitudes[node] = float(row[longitude_column])
+        graph.latitudes = latitudes
+        graph.longitudes = longitudes
+    else:
+        locations = {}
+        for chunk in read_chunks(path, delimiter, chunk_size, latitude_column, header):
+            for row in chunk:
+                name = row[node_column].strip()
+                if graph.has_node(name):
+                    locations[name] = (float(row[latitude_column]), float(row[longitude_column]))
+        graph.locations = locations
+
+    # cached heuristics and spatial index were computed without these coordinates
+    graph.heuristic_cache.clear()
+    graph.spatial_index = None
+    return graph
+
+############################################################################################################
+# End of Coordinates loader
+############################################################################################################
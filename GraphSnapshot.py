@@ -0,0 +1,276 @@
+import sys
+import mmap
+import struct
+from ast import literal_eval
+from array import array
+from SimpleProblemSolvingAgent import Graph, CompactGraph, Landmarks
+
+############################################################################################################
+# This file contains the GraphSnapshot class which saves a graph to a versioned binary file and opens it
+# again as a CompactGraph without parsing anything.
+#
+# Every array of the graph is stored as raw little endian values, 8 byte aligned. Opening a snapshot maps
+# the file with mmap and casts memoryviews straight onto those bytes, so starting up costs a few page faults
+# instead of importing romania_map.py, running make_undirected and attaching locations. Node names are
+# only decoded when they are looked up. SharedGraph.py puts the same layout in shared memory instead of a file.
+# Names that are not strings (e.g. int or (x, y) tuple nodes) are stored as their repr and read back with
+# ast.literal_eval, so they must be Python literals.
+#
+# File layout (little endian):
+#     header   - magic b'RMGS', version (uint32), flags (uint32), number of landmarks k (uint32),
+#                number of nodes n (uint64), number of edges m (uint64)
+#     sections - (offset, length in bytes) uint64 pairs, one per entry of SECTIONS, length 0 when absent
+#     names          - UTF-8 bytes of every node name (its repr if it is not a str), one after the other
+#     name offsets   - n + 1 int64, name i is names[name_offsets[i]:name_offsets[i + 1]]
+#     name types     - n uint8, 1 where the name is a repr to read back with literal_eval (optional, all str)
+#     offsets        - n + 1 int64, the CSR row offsets (see CompactGraph)
+#     targets        - m int32
+#     weights        - m float64
+#     latitudes      - n float64 (optional)
+#     longitudes     - n float64 (optional)
+#     landmarks      - k int32 landmark node ids (optional)
+#     from landmarks - k x n float64, shortest path costs from each landmark (optional)
+#     to landmarks   - k x n float64, shortest path costs to each landmark, only for directed graphs
+#
+# Run this file to save romania_map to RomaniaGraph.snapshot.
+############################################################################################################
+
+MAGIC = b'RMGS'
+VERSION = 2
+DIRECTED = 1
+HEADER = struct.Struct('<4sIIIQQ')
+SECTIONS = ('names', 'name_offsets', 'name_types', 'offsets', 'targets', 'weights', 'latitudes', 'longitudes',
+            'landmarks', 'from_landmarks', 'to_landmarks')
+TABLE = struct.Struct('<' + 'QQ' * len(SECTIONS))
+
+
+############################################################################################################
+# SnapshotNames class - the node name table of a snapshot, decoding each name when it is looked up
+############################################################################################################
+
+class SnapshotNames:
+    # constructor takes the UTF-8 name bytes, the name offsets and the name types (None when all are str)
+    def __init__(self, data, offsets, types=None):
+        self.data = data
+        self.offsets = offsets
+        self.types = types
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, node):
+        if node < 0:
+            node += len(self)
+        if not 0 <= node < len(self):
+            raise IndexError(node)
+        name = str(self.data[self.offsets[node]:self.offsets[node + 1]], 'utf-8')
+        if self.types is not None and self.types[node]:
+            return literal_eval(name)
+        return name
+
+    def __iter__(self):
+        for node in range(len(self)):
+            yield self[node]
+
+############################################################################################################
+# End of SnapshotNames class
+############################################################################################################
+
+
+############################################################################################################
+# GraphSnapshot class
+############################################################################################################
+
+class GraphSnapshot:
+    # constructor takes the opened graph and the file and memory map backing it
+    def __init__(self, graph, file=None, mapped=None, views=()):
+        self.graph = graph
+        self.file = file
+        self.mapped = mapped
+        self.views = views
+
+    # method to write a Graph or CompactGraph to filename
+    # landmarks default to the ones attached to the graph, a Graph is converted with CompactGraph.from_graph
+    @staticmethod
+    def write(graph, filename, landmarks=None):
+        size, parts = GraphSnapshot.layout(graph, landmarks)
+        with open(filename, 'wb') as file:
+            for offset, data in parts:
+                file.seek(offset)
+                file.write(data)
+
+    # method to lay a graph out in the snapshot format, returns the total size in bytes and the
+    # (offset, bytes) parts to place at each offset
+    @staticmethod
+    def layout(graph, landmarks=None):
+        if landmarks is None:
+            landmarks = graph.landmarks
+        if isinstance(graph, Graph):
+            compact = CompactGraph.from_graph(graph)
+            keys = compact.names
+        else:
+            compact = graph
+            keys = range(len(compact.names))
+        n = len(compact.names)
+
+        names = bytearray()
+        name_offsets = array('q', [0])
+        name_types = bytearray(n)
+        for i, name in enumerate(compact.names):
+            if not isinstance(name, str):
+                text = repr(name)
+                try:
+                    restored = literal_eval(text)
+                except (ValueError, SyntaxError):
+                    restored = None
+                if type(restored) is not type(name) or restored != name:
+                    raise ValueError(f"node {text} cannot be saved in a snapshot, node names must be str or Python literals")
+                name, name_types[i] = text, 1
+            names += name.encode('utf-8')
+            name_offsets.append(len(names))
+
+        sections = {
+            'names': bytes(names),
+            'name_offsets': name_offsets.tobytes(),
+            'name_types': bytes(name_types) if any(name_types) else b'',
+            'offsets': array('q', compact.offsets).tobytes(),
+            'targets': array('i', compact.targets).tobytes(),
+            'weights': array('d', compact.weights).tobytes(),
+        }
+        if compact.latitudes is not None:
+            sections['latitudes'] = array('d', compact.latitudes).tobytes()
+            sections['longitudes'] = array('d', compact.longitudes).tobytes()
+
+        # landmark rows are reordered to follow the node ids of the compact graph
+        if landmarks is not None and landmarks.landmarks:
+            def rows(table):
+                data = bytearray()
+                for row in table:
+                    data += array('d', [row[landmarks.index[key]] for key in keys]).tobytes()
+                return bytes(data)
+            ids = [compact.id_of(landmark) for landmark in landmarks.landmarks] if keys is compact.names else landmarks.landmarks
+            sections['landmarks'] = array('i', ids).tobytes()
+            sections['from_landmarks'] = rows(landmarks.from_landmarks)
+            if landmarks.to_landmarks is not landmarks.from_landmarks:
+                sections['to_landmarks'] = rows(landmarks.to_landmarks)
+            k = len(ids)
+        else:
+            k = 0
+
+        # place every section on an 8 byte boundary after the header and section table
+        table = []
+        position = HEADER.size + TABLE.size
+        for name in SECTIONS:
+            data = sections.get(name, b'')
+            position += -position % 8
+            table.extend((position, len(data)))
+            position += len(data)
+
+        flags = DIRECTED if compact.directed else 0
+        parts = [(0, HEADER.pack(MAGIC, VERSION, flags, k, n, len(compact.targets)) + TABLE.pack(*table))]
+        for i, name in enumerate(SECTIONS):
+            parts.append((table[2 * i], sections.get(name, b'')))
+        return position, parts
+
+    # method to open a snapshot file, every array of the graph is a view into the memory mapped file
+    @classmethod
+    def open(cls, filename):
+        file = open(filename, 'rb')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            graph, views = cls.read(mapped)
+        except ValueError:
+            mapped.close()
+            file.close()
+            raise ValueError(f"{filename} is not a version {VERSION} graph snapshot file")
+        return cls(graph, file, mapped, views)
+
+    # method to read the graph laid out in a buffer (a memory map, shared memory, bytes)
+    # returns the graph and the views cast onto the buffer, which have to be released before it is closed
+    @staticmethod
+    def read(buffer):
+        view = memoryview(buffer)
+        if len(view) < HEADER.size + TABLE.size:
+            view.release()
+            raise ValueError("not a graph snapshot")
+        magic, version, flags, k, n, m = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            view.release()
+            raise ValueError("not a graph snapshot")
+        table = TABLE.unpack_from(view, HEADER.size)
+        views = [view]
+
+        # view of a section cast to typecode, None when the section is absent
+        def section(name, typecode):
+            i = SECTIONS.index(name)
+            offset, length = table[2 * i], table[2 * i + 1]
+            if length == 0:
+                return None
+            part = view[offset:offset + length].cast(typecode)
+            views.append(part)
+            return part
+
+        names = SnapshotNames(section('names', 'B') or b'', section('name_offsets', 'q'), section('name_types', 'B'))
+        graph = CompactGraph(names, section('offsets', 'q'), section('targets', 'i') or array('i'),
+                             section('weights', 'd') or array('d'), section('latitudes', 'd'),
+                             section('longitudes', 'd'), bool(flags & DIRECTED))
+
+        if k:
+            def rows(data):
+                if data is None:
+                    return None
+                parts = [data[i * n:(i + 1) * n] for i in range(k)]
+                views.extend(parts)
+                return parts
+            landmark_ids = section('landmarks', 'i').tolist()
+            from_landmarks = rows(section('from_landmarks', 'd'))
+            to_landmarks = rows(section('to_landmarks', 'd'))
+            graph.landmarks = Landmarks(range(n), landmark_ids, from_landmarks, to_landmarks)
+
+        return graph, views
+
+    # method to drop everything of a graph that refers to its buffer and release the views from read
+    @staticmethod
+    def release(graph, views):
+        graph.landmarks = None
+        graph.reverse_graph = None
+        graph.spatial_index = None
+        graph.heuristic_cache.clear()
+        for view in reversed(views):
+            view.release()
+
+    # method to close the memory mapped file, the graph can no longer be used afterwards
+    def close(self):
+        if self.mapped is not None:
+            self.release(self.graph, self.views)
+            self.mapped.close()
+            self.file.close()
+            self.mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+############################################################################################################
+# End of GraphSnapshot class
+############################################################################################################
+
+
+############################################################################################################
+# Main function - saves romania_map, with its landmarks if RomaniaLandmarks.json exists
+# Usage: python3 GraphSnapshot.py [output file]
+############################################################################################################
+
+def main():
+    import os
+    from romania_map import romania_map
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else "RomaniaGraph.snapshot"
+    landmarks = Landmarks.load("RomaniaLandmarks.json") if os.path.exists("RomaniaLandmarks.json") else None
+    GraphSnapshot.write(romania_map, filename, landmarks)
+    print("Saved to ", filename)
+
+if __name__ == "__main__":
+    main()
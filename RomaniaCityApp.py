@@ -1,4 +1,12 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from SimpleProblemSolvingAgent import SimpleProblemSolvingAgent
+from SpatialIndex import SpatialIndex
 from romania_map import romania_map
 
 ############################################################################################################
@@ -16,17 +24,130 @@ from romania_map import romania_map
 #     - Hill Climbing Search
 #     - Simulated Annealing Search
 # The app will prompt the user to enter a start city and a goal city.
+# A city can also be entered as a latitude and longitude (e.g. 45.8, 24.1), the closest city is then used.
 # The app will then calculate the best path between the two cities using the above search strategies.
 # The app will then prompt the user to find the best path between another pair of cities.
+#
+# Batch mode (--batch) runs without prompts: it reads one "start,goal" pair per line from a file (or stdin
+# with --batch -), runs the chosen strategies for every pair concurrently on a process pool and prints one
+# JSON line per pair, in input order, with the path, cost and search time of each strategy:
+#     python3 RomaniaCityApp.py --batch pairs.txt --strategies a_star,greedy_best_first --workers 4
+############################################################################################################
+
+
+############################################################################################################
+# Batch mode
+############################################################################################################
+
+STRATEGIES = ('greedy_best_first', 'a_star', 'hill_climbing', 'simulated_annealing')
+
+# runs one strategy for one pair of cities, returns its result as a dictionary for the JSON output
+def run_strategy(start_city, goal_city, strategy):
+    started = time.perf_counter()
+    try:
+        result = SimpleProblemSolvingAgent(romania_map, start_city, goal_city).search(strategy)
+        if isinstance(result, str):
+            raise ValueError(result)
+        path, cost = result
+        line = {"path": list(path), "cost": None if cost == float('inf') else cost}
+    except Exception as error:
+        line = {"error": str(error) if isinstance(error, ValueError) else repr(error)}
+    line["time_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return line
+
+# reads "start,goal" pairs (comma or tab separated) from the lines of a file, skipping blank lines
+def read_pairs(file):
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        separator = '\t' if '\t' in line else ','
+        start_city, _, goal_city = line.partition(separator)
+        yield start_city.strip(), goal_city.strip()
+
+# runs the batch, keeping a window of pairs in flight so every core stays busy while the output is
+# written in input order
+def batch(pairs, strategies, workers, output=sys.stdout):
+    executor = ProcessPoolExecutor(workers) if workers != 1 else None
+    window = 4 * (workers or os.cpu_count() or 1)
+    pending = deque()
+
+    # writes the results of the oldest pair once all its strategies are done
+    def write_oldest():
+        start_city, goal_city, results = pending.popleft()
+        line = {"start": start_city, "goal": goal_city}
+        if isinstance(results, str):
+            line["error"] = results
+        else:
+            line["results"] = {strategy: result if isinstance(result, dict) else result.result() for strategy, result in results}
+        output.write(json.dumps(line) + "\n")
+        output.flush()
+
+    try:
+        for start_city, goal_city in pairs:
+            if not romania_map.has_node(start_city):
+                results = "Start city not found: " + start_city
+            elif not romania_map.has_node(goal_city):
+                results = "Goal city not found: " + goal_city
+            elif executor is None:
+                results = [(strategy, run_strategy(start_city, goal_city, strategy)) for strategy in strategies]
+            else:
+                results = [(strategy, executor.submit(run_strategy, start_city, goal_city, strategy)) for strategy in strategies]
+            pending.append((start_city, goal_city, results))
+            if len(pending) >= window:
+                write_oldest()
+        while pending:
+            write_oldest()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+############################################################################################################
+# End of Batch mode
+############################################################################################################
+
+
 ############################################################################################################
 # Main function - This function is the entry point of the program.
 ############################################################################################################
 
 def main():
+    parser = argparse.ArgumentParser(description="Find the best path between two cities in Romania")
+    parser.add_argument('--batch', metavar='FILE', help="read start,goal pairs from FILE ('-' for stdin) and print JSON lines")
+    parser.add_argument('--strategies', default=",".join(STRATEGIES), help="comma separated strategies for batch mode")
+    parser.add_argument('--workers', type=int, default=None, help="processes for batch mode (default: one per core, 1 runs in this process)")
+    args = parser.parse_args()
+
+    if args.batch is not None:
+        strategies = [strategy.strip() for strategy in args.strategies.split(',') if strategy.strip()]
+        if args.batch == '-':
+            batch(read_pairs(sys.stdin), strategies, args.workers)
+        else:
+            with open(args.batch) as file:
+                batch(read_pairs(file), strategies, args.workers)
+        return
+
     # list of valid cities user can enter
     valid_cities = list(romania_map.nodes())
     valid_cities.sort()
 
+    # spatial index of the city locations, kept on the graph so the agents reuse it
+    spatial_index = SpatialIndex.build(romania_map)
+    romania_map.spatial_index = spatial_index
+
+    # place turns a "latitude, longitude" entry into the closest city and returns other entries unchanged
+    def place(text):
+        parts = text.split(',')
+        if len(parts) != 2:
+            return text
+        try:
+            latitude, longitude = float(parts[0]), float(parts[1])
+        except ValueError:
+            return text
+        city, distance = spatial_index.nearest(latitude, longitude)
+        print("Closest city to ", latitude, ", ", longitude, " is ", city, " (", round(distance, 1), " km away)", sep="")
+        return city
+
     # print the welcome message
     print()
     print("Welcome to Romania City App")
@@ -35,26 +156,29 @@ def main():
     print()
     print("This app uses real world data to calculate the distances between cities in Romania.")
 
-    # inner_main is a recursive function that prompts the user to enter a start city and a goal city.
+    # inner_main prompts the user to enter a start city and a goal city and finds the paths between them.
+    # returns True when the user wants to enter another pair of cities, so a long session runs in a loop
+    # instead of growing the call stack.
     def inner_main():
         print()
         print("Valid cities are: ", ", ".join(valid_cities))
+        print("A latitude and longitude can be entered instead of a city, e.g. 45.8, 24.1")
         print()
 
-        start_city = input("Enter a starting city: ")
+        start_city = place(input("Enter a starting city: "))
         print()
-        goal_city = input("Enter a destination city: ")
+        goal_city = place(input("Enter a destination city: "))
         print()
         valid_check = True
 
         # check if the start city is valid
-        if start_city not in romania_map.nodes():
+        if not romania_map.has_node(start_city):
             valid_check = False
             print("Start city not found. Please enter a valid start city.")
             print()
 
         # check if the goal city is valid
-        if goal_city not in romania_map.nodes():
+        if not romania_map.has_node(goal_city):
             valid_check = False
             print("Goal city not found. Please enter a valid goal city.")
             print()
@@ -70,8 +194,7 @@ def main():
             print()
             input("Press enter to try again...")
             print()
-            inner_main()
-            return
+            return True
 
         # create a SimpleProblemSolvingAgent object from SimpleProblemSolvingAgent.py. 
         # Takes in the graph, user entered start city, and user entered goal city.
@@ -82,10 +205,7 @@ def main():
 
         # print the path and cost of greedy best first search
         print("Greedy Best First Search:")
-        path_str = ""
-        for i in bfs_path:
-            path_str += i + " → "
-        print("     Path: ", path_str[:-3])
+        print("     Path: ", " → ".join(bfs_path))
         print("     Cost: ", bfs_cost)
         print()
 
@@ -94,10 +214,7 @@ def main():
         
         # print the path and cost of a* search
         print("A* Search:")
-        path_str = ""
-        for i in astar_path:
-            path_str += i + " → "
-        print("     Path: ", path_str[:-3])   
+        print("     Path: ", " → ".join(astar_path))
         print("     Cost: ", astar_cost)
         print()
 
@@ -106,10 +223,7 @@ def main():
         
         # print the path and cost of hill climbing search
         print("Hill Climbing Search:")
-        path_str = ""
-        for i in hill_climbing_path:
-            path_str += i + " → "
-        print("     Path: ", path_str[:-3])
+        print("     Path: ", " → ".join(hill_climbing_path))
         print("     Cost: ", hill_climbing_cost)
         print()
 
@@ -118,10 +232,7 @@ def main():
 
         # print the path and cost of simulated annealing search
         print("Simulated Annealing Search:")
-        path_str = ""
-        for i in simulated_annealing_path:
-            path_str += i + " → "
-        print("     Path: ", path_str[:-3])
+        print("     Path: ", " → ".join(simulated_annealing_path))
         print("     Cost: ", simulated_annealing_cost)
         print()
 
@@ -129,15 +240,17 @@ def main():
         if (input("Would you like to find the best path between another pair of cities? (y/n): ") == 'y'):
             print()
             print("#################################################")
-            inner_main()
+            return True
         else:
             print()
             print("#################################################")
             print()
             print("Thank you for using our app!")
             print()
+            return False
 
-    inner_main()
+    while inner_main():
+        pass
 
 ############################################################################################################
 # End of main function
@@ -0,0 +1,380 @@
+import os
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from SimpleProblemSolvingAgent import UndirectedGraph, SimpleProblemSolvingAgent, Landmarks, STRATEGIES as SEARCHES, haversine_array, dijkstra, np
+
+############################################################################################################
+# Routing Benchmark
+# Builds synthetic graphs with coordinates, runs SimpleProblemSolvingAgent strategies over a fixed,
+# seeded set of queries, and reports for every (graph, strategy):
+#     - latency percentiles (p50, p90, p99, max) and throughput in queries per second
+#     - peak memory allocated while answering queries (measured with tracemalloc on a separate pass)
+#     - solution quality as the ratio of the returned cost to the optimal (Dijkstra) cost
+#     - preprocessing time for the strategies that need it ('ch', 'distance_matrix' and 'alt')
+# Results are written as JSON so runs on different commits can be compared with --compare.
+#
+# Graph generators (all undirected, nodes are integers, edge costs are the haversine length of the
+# edge in km times a random detour factor of 1 to 1.3, rounded up, so the haversine heuristic stays
+# admissible):
+#     grid       - square grid with 4-neighbor roads
+#     geometric  - random points connected to their nearest neighbors
+#     scale_free - Barabasi-Albert preferential attachment graph with random coordinates
+#
+# Usage example:
+#     python3 RoutingBenchmark.py --generators grid,geometric --sizes 1000,10000 --queries 200 --output bench.json
+#     python3 RoutingBenchmark.py --sizes 1000 --compare bench.json
+############################################################################################################
+
+# bounding box of the generated coordinates (roughly Romania)
+LATITUDES = (43.6, 48.3)
+LONGITUDES = (20.3, 29.7)
+
+# every strategy of SimpleProblemSolvingAgent.search, plus 'alt': a_star with landmarks attached to the graph
+STRATEGIES = list(SEARCHES) + ['alt']
+
+# benchmark strategies that run another search strategy on a preprocessed graph
+SEARCH_STRATEGIES = {'alt': 'a_star'}
+
+
+############################################################################################################
+# Graph generators
+############################################################################################################
+
+# builds an undirected graph from a list of (a, b) edges and node locations, costs are derived from the haversine length
+def graph_from_edges(edges, locations, rng):
+    latitudes1 = [locations[a][0] for a, b in edges]
+    longitudes1 = [locations[a][1] for a, b in edges]
+    latitudes2 = [locations[b][0] for a, b in edges]
+    longitudes2 = [locations[b][1] for a, b in edges]
+    lengths = haversine_array(latitudes1, longitudes1, latitudes2, longitudes2)
+
+    # each road is stored once, under its lower numbered end, so both directions get the same cost
+    graph_dict = {node: {} for node in locations}
+    for (a, b), length in zip(edges, lengths):
+        if a == b:
+            continue
+        a, b = min(a, b), max(a, b)
+        cost = max(1, math.ceil(float(length) * rng.uniform(1.0, 1.3)))
+        if b not in graph_dict[a] or cost < graph_dict[a][b]:
+            graph_dict[a][b] = cost
+    graph = UndirectedGraph(graph_dict)
+    graph.locations = locations
+    return graph
+
+# connects every connected component to the first one so all queries have an answer
+def connect_components(edges, nodes):
+    adjacency = {node: [] for node in nodes}
+    for a, b in edges:
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+    seen = set()
+    first = None
+    for node in nodes:
+        if node in seen:
+            continue
+        seen.add(node)
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for next in adjacency[current]:
+                if next not in seen:
+                    seen.add(next)
+                    stack.append(next)
+        if first is None:
+            first = node
+        else:
+            edges.append((node, first))
+    return edges
+
+# square grid of about n nodes
+def grid_graph(n, seed):
+    rng = random.Random(seed)
+    side = max(2, int(math.sqrt(n)))
+    lat_step = (LATITUDES[1] - LATITUDES[0]) / side
+    lon_step = (LONGITUDES[1] - LONGITUDES[0]) / side
+    locations = {}
+    edges = []
+    for i in range(side):
+        for j in range(side):
+            node = i * side + j
+            locations[node] = (LATITUDES[0] + i * lat_step, LONGITUDES[0] + j * lon_step)
+            if i + 1 < side:
+                edges.append((node, node + side))
+            if j + 1 < side:
+                edges.append((node, node + 1))
+    return graph_from_edges(edges, locations, rng)
+
+# random points, each connected to its k nearest neighbors found through a grid of buckets
+def geometric_graph(n, seed, k=4):
+    rng = random.Random(seed)
+    locations = {node: (rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)) for node in range(n)}
+
+    # about two points per bucket
+    cells = max(1, int(math.sqrt(n / 2)))
+    lat_size = (LATITUDES[1] - LATITUDES[0]) / cells
+    lon_size = (LONGITUDES[1] - LONGITUDES[0]) / cells
+    buckets = {}
+    for node, (lat, lon) in locations.items():
+        cell = (min(cells - 1, int((lat - LATITUDES[0]) / lat_size)), min(cells - 1, int((lon - LONGITUDES[0]) / lon_size)))
+        buckets.setdefault(cell, []).append(node)
+
+    edges = []
+    for node, (lat, lon) in locations.items():
+        row = min(cells - 1, int((lat - LATITUDES[0]) / lat_size))
+        column = min(cells - 1, int((lon - LONGITUDES[0]) / lon_size))
+        # widen the ring of buckets until it holds at least k other points
+        radius = 1
+        while True:
+            candidates = [other for i in range(row - radius, row + radius + 1) for j in range(column - radius, column + radius + 1)
+                          for other in buckets.get((i, j), ()) if other != node]
+            if len(candidates) >= k or radius >= cells:
+                break
+            radius += 1
+        candidates.sort(key=lambda other: (locations[other][0] - lat) ** 2 + ((locations[other][1] - lon) * 0.7) ** 2)
+        for other in candidates[:k]:
+            edges.append((node, other))
+
+    return graph_from_edges(connect_components(edges, list(locations)), locations, rng)
+
+# Barabasi-Albert graph, each new node attaches to m existing nodes chosen proportionally to their degree
+def scale_free_graph(n, seed, m=2):
+    rng = random.Random(seed)
+    locations = {node: (rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)) for node in range(n)}
+    edges = []
+    # every edge endpoint once, so a uniform choice from it is a degree proportional choice
+    endpoints = []
+    for node in range(min(m + 1, n)):
+        for other in range(node):
+            edges.append((node, other))
+            endpoints.extend((node, other))
+    for node in range(m + 1, n):
+        targets = set()
+        while len(targets) < m:
+            targets.add(rng.choice(endpoints))
+        for other in targets:
+            edges.append((node, other))
+            endpoints.extend((node, other))
+    return graph_from_edges(edges, locations, rng)
+
+GENERATORS = {
+    'grid': grid_graph,
+    'geometric': geometric_graph,
+    'scale_free': scale_free_graph,
+}
+
+############################################################################################################
+# End of Graph generators
+############################################################################################################
+
+
+############################################################################################################
+# Benchmark helpers
+############################################################################################################
+
+# value below which the given fraction of the sorted values fall
+def percentile(values, fraction):
+    if not values:
+        return None
+    position = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[position]
+
+# fixed set of (start, goal) queries with different start and goal nodes
+def make_queries(graph, count, seed):
+    rng = random.Random(seed)
+    nodes = sorted(graph.nodes())
+    queries = []
+    while len(queries) < count and len(nodes) > 1:
+        start, goal = rng.sample(nodes, 2)
+        queries.append((start, goal))
+    return queries
+
+# runs the preprocessing a strategy needs, returns the seconds it took or None if it needs none
+def preprocess(graph, strategy, workdir):
+    started = time.perf_counter()
+    if strategy == 'ch':
+        from ContractionHierarchy import ContractionHierarchy
+        graph.hierarchy = ContractionHierarchy.build(graph)
+    elif strategy == 'distance_matrix':
+        from DistanceMatrix import DistanceMatrix
+        filename = os.path.join(workdir, 'matrix.bin')
+        DistanceMatrix.build(graph, filename)
+        graph.distance_matrix = DistanceMatrix.open(filename)
+    elif strategy == 'alt':
+        graph.use_landmarks(Landmarks.build(graph))
+    else:
+        return None
+    return time.perf_counter() - started
+
+# runs one strategy over the queries and measures it
+def run_strategy(graph, strategy, queries, optimal, memory_queries):
+    strategy = SEARCH_STRATEGIES.get(strategy, strategy)
+    latencies = []
+    ratios = []
+    failures = 0
+    # number of queries that raised each distinct exception, keyed on its type and message
+    errors = {}
+    started = time.perf_counter()
+    for (start, goal), best in zip(queries, optimal):
+        query_started = time.perf_counter()
+        try:
+            path, cost = SimpleProblemSolvingAgent(graph, start, goal).search(strategy)
+        except Exception as error:
+            path, cost = [], float('inf')
+            message = f"{type(error).__name__}: {error}"
+            errors[message] = errors.get(message, 0) + 1
+        latencies.append(time.perf_counter() - query_started)
+        if not path or cost == float('inf'):
+            failures += 1
+        elif best > 0:
+            ratios.append(cost / best)
+    elapsed = time.perf_counter() - started
+
+    # separate pass for memory, tracemalloc slows everything down so it is kept out of the latencies
+    tracemalloc.start()
+    for start, goal in queries[:memory_queries]:
+        try:
+            SimpleProblemSolvingAgent(graph, start, goal).search(strategy)
+        except Exception:
+            pass
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'queries': len(queries),
+        'failures': failures,
+        'errors': errors,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p90': percentile(latencies, 0.90),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_max': latencies[-1] if latencies else None,
+        'throughput': len(queries) / elapsed if elapsed > 0 else None,
+        'peak_memory_bytes': peak_memory,
+        'quality_mean': sum(ratios) / len(ratios) if ratios else None,
+        'quality_max': max(ratios) if ratios else None,
+    }
+
+# commit the benchmark runs on, if this is a git checkout
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+# reads the runs of an earlier results file, keyed on (generator, size, strategy)
+def load_results(filename):
+    with open(filename) as file:
+        return {(run['generator'], run['size'], run['strategy']): run for run in json.load(file)['results']}
+
+# prints the change in p50 latency against the runs of an earlier results file
+def compare(results, previous, filename):
+    print()
+    print("Compared to ", filename)
+    for run in results:
+        before = previous.get((run['generator'], run['size'], run['strategy']))
+        if before is None or not before.get('latency_p50') or not run.get('latency_p50'):
+            continue
+        print(f"     {run['generator']:>10} {run['size']:>8} {run['strategy']:>22}: p50 x{run['latency_p50'] / before['latency_p50']:.2f}")
+
+############################################################################################################
+# End of Benchmark helpers
+############################################################################################################
+
+
+############################################################################################################
+# Main function - This function is the entry point of the program.
+############################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SimpleProblemSolvingAgent strategies on synthetic graphs.")
+    parser.add_argument('--generators', default='grid,geometric,scale_free', help="comma separated graph generators: " + ", ".join(GENERATORS))
+    parser.add_argument('--sizes', default='1000,10000', help="comma separated node counts (1000 up to 1000000)")
+    parser.add_argument('--strategies', default=','.join(STRATEGIES), help="comma separated strategies: " + ", ".join(STRATEGIES))
+    parser.add_argument('--queries', type=int, default=100, help="number of queries per graph")
+    parser.add_argument('--memory-queries', type=int, default=10, help="number of queries of the peak memory pass")
+    parser.add_argument('--seed', type=int, default=534, help="seed of the graphs and queries")
+    parser.add_argument('--ch-limit', type=int, default=20000, help="largest graph to build a contraction hierarchy for")
+    parser.add_argument('--matrix-limit', type=int, default=2000, help="largest graph to build a distance matrix for")
+    parser.add_argument('--output', default='bench_results.json', help="JSON file to write the results to")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+    unknown = [strategy for strategy in args.strategies.split(',') if strategy not in STRATEGIES]
+    if unknown:
+        parser.error("unknown strategies: " + ", ".join(unknown))
+    unknown = [generator for generator in args.generators.split(',') if generator not in GENERATORS]
+    if unknown:
+        parser.error("unknown generators: " + ", ".join(unknown))
+
+    # read the baseline first, --compare may name the file --output is about to overwrite
+    previous = load_results(args.compare) if args.compare else None
+
+    limits = {'ch': args.ch_limit, 'distance_matrix': args.matrix_limit}
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for generator in args.generators.split(','):
+            for size in [int(size) for size in args.sizes.split(',')]:
+                started = time.perf_counter()
+                graph = GENERATORS[generator](size, args.seed)
+                build_time = time.perf_counter() - started
+                edges = sum(len(links) for links in graph.graph_dict.values())
+                print(f"{generator} graph with {size} nodes and {edges} edges built in {build_time:.2f}s")
+
+                # optimal costs for the quality ratios
+                queries = make_queries(graph, args.queries, args.seed)
+                optimal = [dijkstra(graph, start, targets=[goal])[0].get(goal, float('inf')) for start, goal in queries]
+
+                for strategy in args.strategies.split(','):
+                    run = {'generator': generator, 'size': size, 'edges': edges, 'strategy': strategy}
+                    if size > limits.get(strategy, size):
+                        run['skipped'] = f"graph larger than the {strategy} limit"
+                        print(f"     {strategy}: skipped")
+                        results.append(run)
+                        continue
+                    run['preprocessing_time'] = preprocess(graph, strategy, workdir)
+                    run.update(run_strategy(graph, strategy, queries, optimal, args.memory_queries))
+                    if strategy == 'alt':
+                        graph.use_landmarks(None)
+                    results.append(run)
+                    if not queries:
+                        print(f"     {strategy}: no queries")
+                        continue
+                    print(f"     {strategy}: p50 {run['latency_p50'] * 1000:.3f}ms, p99 {run['latency_p99'] * 1000:.3f}ms, "
+                          f"{run['throughput']:.1f} queries/s, quality {run['quality_mean']}, failures {run['failures']}")
+                    for message, count in run['errors'].items():
+                        print(f"          {count} x {message}")
+
+                matrix = getattr(graph, 'distance_matrix', None)
+                if matrix is not None:
+                    matrix.close()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__ if np is not None else None,
+            'arguments': vars(args),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print("Saved to ", args.output)
+
+    if previous is not None:
+        compare(results, previous, args.compare)
+
+############################################################################################################
+# End of main function
+############################################################################################################
+
+if __name__ == "__main__":
+    main()
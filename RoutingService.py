@@ -0,0 +1,363 @@
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from urllib.parse import urlsplit, parse_qsl
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from SimpleProblemSolvingAgent import SimpleProblemSolvingAgent, CompactGraph, integer_costs
+from SharedGraph import SharedGraph
+
+############################################################################################################
+# This file contains the RoutingService class, a small asyncio HTTP/JSON server that answers routing
+# requests on a graph loaded once at startup.
+#
+# Searches are CPU bound, so they run on a worker pool (threads, or processes with --processes which all
+# attach to one copy of the graph published in shared memory, see SharedGraph.py) and the event loop only
+# handles connections:
+#     - backpressure: at most max_pending different searches are queued or running, further requests 
+#       are answered with 503 at once instead of piling up behind them
+#     - coalescing: identical requests that arrive while the first one is still being searched wait for
+#       that search instead of starting their own
+#     - timeouts: a request gets 504 once timeout seconds pass, the search itself finishes in the
+#       background so coalesced requests can still use it
+#
+# Endpoints:
+#     GET  /route?start=Arad&goal=Bucharest&strategy=a_star
+#     POST /route   with a JSON body {"start": ..., "goal": ..., "strategy": ..., "options": {...}}
+#     GET  /health
+# A start or goal can also be a "latitude,longitude" string, it is snapped to the closest node.
+# Responses are JSON: {"start", "goal", "strategy", "path", "cost", "time_ms"}, cost is null when the
+# goal cannot be reached. The 'k_shortest' strategy answers with all its routes, 
+# "routes": [{"path", "cost"}, ...] instead of path and cost.
+#
+# Usage: python3 RoutingService.py [--port 8534] [--workers 4] [--processes] [--edges roads.csv.gz]
+############################################################################################################
+
+
+############################################################################################################
+# Worker functions - run on the worker pool
+############################################################################################################
+
+worker_graph = None
+worker_shared = None
+worker_integer_costs = False
+
+# raised for a request the graph cannot answer (an unknown node), answered with 400 instead of 500
+class RequestError(Exception):
+    pass
+
+# sets the graph searched by the worker
+def init_worker(graph):
+    global worker_graph
+    worker_graph = graph
+
+# attaches the worker to the graph published in shared memory under name
+# integer_costs tells that the published graph had integer costs, which the shared copy stores as floats
+def init_shared_worker(name, integer_costs=False):
+    global worker_shared, worker_integer_costs
+    worker_shared = SharedGraph.attach(name)
+    worker_integer_costs = integer_costs
+    init_worker(worker_shared.graph)
+
+# cost of a route in the number type of the published graph, so answers do not depend on the pool type
+def worker_cost(cost):
+    if worker_integer_costs and cost != float('inf'):
+        return int(round(cost))
+    return cost
+
+# node of a place of a request, (latitude, longitude) tuples are left for the agent to snap
+# the nodes of a CompactGraph are ids, so city names are turned into ids
+def worker_node(place):
+    if isinstance(place, tuple):
+        return place
+    if isinstance(worker_graph, CompactGraph):
+        try:
+            return worker_graph.id_of(place)
+        except KeyError:
+            raise RequestError(f"unknown node {place!r}")
+    if not worker_graph.has_node(place):
+        raise RequestError(f"unknown node {place!r}")
+    return place
+
+# runs one search and returns the start and goal nodes, the result and the search time in milliseconds
+# the nodes are checked before searching, so any error raised by the search itself is an internal error
+def run_search(start_city, goal_city, strategy, options):
+    started = time.perf_counter()
+    compact = isinstance(worker_graph, CompactGraph)
+    start_city, goal_city = worker_node(start_city), worker_node(goal_city)
+    # the service was not given the precomputed matrix this strategy looks routes up in
+    if strategy == 'distance_matrix' and getattr(worker_graph, 'distance_matrix', None) is None:
+        raise RequestError("the distance_matrix strategy is not available, no distance matrix is loaded")
+    try:
+        agent = SimpleProblemSolvingAgent(worker_graph, start_city, goal_city)
+    except ValueError as error:
+        # coordinates given for a graph without any
+        raise RequestError(str(error))
+    if strategy == 'k_shortest':
+        result = agent.k_shortest_paths(**options)
+    else:
+        result = agent.search(strategy, **options)
+    start_city, goal_city = agent.start_city, agent.goal_city
+    if compact:
+        start_city, goal_city = worker_graph.name_of(start_city), worker_graph.name_of(goal_city)
+        if isinstance(result, list):
+            result = [(worker_graph.path_names(path), worker_cost(cost)) for path, cost in result]
+        else:
+            result = worker_graph.path_names(result[0]), worker_cost(result[1])
+    return start_city, goal_city, result, (time.perf_counter() - started) * 1000
+
+############################################################################################################
+# End of Worker functions
+############################################################################################################
+
+
+############################################################################################################
+# Helper functions
+############################################################################################################
+
+# turns a "latitude,longitude" string into a tuple the agent snaps to a node, other strings are node names
+def parse_place(text):
+    parts = str(text).split(',')
+    if len(parts) == 2:
+        try:
+            return float(parts[0]), float(parts[1])
+        except ValueError:
+            pass
+    return text
+
+# options a client may pass to each strategy: name -> (type, smallest, largest value allowed)
+# anything else (workers, caches, stats, ...) is refused, and the limits keep one request from asking
+# for unbounded work
+STRATEGY_OPTIONS = {
+    'greedy_best_first': {},
+    'a_star': {},
+    'bidirectional_a_star': {},
+    'ch': {},
+    'distance_matrix': {},
+    'lpa_star': {},
+    'hill_climbing': {},
+    'k_shortest': {'k': (int, 1, 20)},
+    'ara_star': {'deadline': (float, 0, 60), 'epsilon': (float, 1, 100), 'epsilon_step': (float, 0.01, 100)},
+    'sma_star': {'max_nodes': (int, 2, 1000000)},
+    'simulated_annealing': {'restarts': (int, 1, 100), 'seed': (int, None, None), 'T': (float, 0.001, 1e6),
+                            'T_min': (float, 1e-9, 1e6), 'alpha': (float, 0.01, 0.999)},
+}
+
+# checks the strategy and options of a request, returns an error message or None when they are fine
+def check_options(strategy, options):
+    allowed = STRATEGY_OPTIONS.get(strategy)
+    if allowed is None:
+        return f"Invalid strategy: {strategy}"
+    for name, value in options.items():
+        if name not in allowed:
+            return f"option {name} is not supported by {strategy}"
+        kind, smallest, largest = allowed[name]
+        # JSON numbers arrive as int or float, bool is an int in Python but not a number here
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and not isinstance(value, int)):
+            return f"option {name} must be {'an integer' if kind is int else 'a number'}"
+        # written so NaN fails the check too
+        if (smallest is not None and not value >= smallest) or (largest is not None and not value <= largest):
+            return f"option {name} must be between {smallest} and {largest}"
+    return None
+
+# JSON cost, null for a goal that cannot be reached
+def json_cost(cost):
+    return None if cost == float('inf') else cost
+
+# builds an HTTP response with a JSON body
+def json_response(status, reason, data, keep_alive=True):
+    body = json.dumps(data).encode('utf-8')
+    headers = [
+        f"HTTP/1.1 {status} {reason}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        "Connection: " + ("keep-alive" if keep_alive else "close"),
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body
+
+############################################################################################################
+# End of Helper functions
+############################################################################################################
+
+
+############################################################################################################
+# RoutingService class
+############################################################################################################
+
+class RoutingService:
+    # constructor takes the graph and the pool and request limits
+    # workers is the number of pool threads or processes (None lets the executor choose)
+    def __init__(self, graph, workers=None, processes=False, max_pending=64, timeout=5.0):
+        self.graph = graph
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.shared = None
+        if processes:
+            # spawned workers start clean, forked ones would inherit (and hold open) the client sockets
+            context = multiprocessing.get_context('spawn')
+            self.shared = SharedGraph.publish(graph)
+            self.executor = ProcessPoolExecutor(workers, context, init_shared_worker, (self.shared.name, integer_costs(graph)))
+        else:
+            init_worker(graph)
+            self.executor = ThreadPoolExecutor(workers)
+        self.in_flight = {}
+
+    # method to answer one routing request, returns (status, data)
+    async def route(self, start_city, goal_city, strategy='a_star', options=None):
+        options = options or {}
+        error = check_options(strategy, options)
+        if error is not None:
+            return 400, {"error": error}
+        try:
+            key = (start_city, goal_city, strategy, tuple(sorted(options.items())))
+            hash(key)
+        except TypeError:
+            return 400, {"error": "start and goal must be strings"}
+
+        # join an identical search that is already running, or start one if there is room
+        task = self.in_flight.get(key)
+        if task is None:
+            if len(self.in_flight) >= self.max_pending:
+                return 503, {"error": "too many pending searches, try again later"}
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(self.executor, run_search, parse_place(start_city), parse_place(goal_city), strategy, options)
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.finished(key, done))
+
+        try:
+            start, goal, result, elapsed = await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {"error": "search timed out"}
+        except RequestError as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": repr(error)}
+
+        data = {"start": start, "goal": goal, "strategy": strategy}
+        if isinstance(result, list):
+            data["routes"] = [{"path": list(path), "cost": json_cost(cost)} for path, cost in result]
+        else:
+            data["path"] = list(result[0])
+            data["cost"] = json_cost(result[1])
+        data["time_ms"] = round(elapsed, 3)
+        return 200, data
+
+    # method to forget a finished search, retrieving its error so a search every request gave up on
+    # does not log an unretrieved exception
+    def finished(self, key, task):
+        self.in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    # method to serve one connection, answering requests until the client closes it
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+
+                status, data = await self.dispatch(method, target, body)
+                reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+                writer.write(json_response(status, reasons[status], data, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # method to route an HTTP request to its endpoint, returns (status, data)
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {"status": "ok", "in_flight": len(self.in_flight)}
+        if url.path != '/route':
+            return 404, {"error": "not found"}
+
+        if method == 'POST':
+            try:
+                request = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {"error": "body is not valid JSON"}
+        else:
+            request = dict(parse_qsl(url.query))
+        if not isinstance(request, dict) or 'start' not in request or 'goal' not in request:
+            return 400, {"error": "start and goal are required"}
+        options = request.get('options') or {}
+        if not isinstance(options, dict):
+            return 400, {"error": "options must be an object"}
+        return await self.route(request['start'], request['goal'], request.get('strategy', 'a_star'), options)
+
+    # method to accept connections on host:port until cancelled
+    async def serve(self, host='127.0.0.1', port=8534):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    # method to shut the worker pool down and free the shared graph
+    # process workers start lazily and attach to the shared graph when they do, so queued searches are
+    # cancelled and the running ones waited for before the graph is freed
+    def close(self):
+        if self.shared is None:
+            self.executor.shutdown(wait=False)
+            return
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.shared.close()
+        self.shared.unlink()
+        self.shared = None
+
+############################################################################################################
+# End of RoutingService class
+############################################################################################################
+
+
+############################################################################################################
+# Main function - serves romania_map, or a graph loaded with GraphLoader
+############################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing service over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8534)
+    parser.add_argument('--workers', type=int, default=None, help="worker threads or processes")
+    parser.add_argument('--processes', action='store_true', help="search on a process pool instead of threads")
+    parser.add_argument('--max-pending', type=int, default=64, help="searches queued or running at once")
+    parser.add_argument('--timeout', type=float, default=5.0, help="seconds before a request gets 504")
+    parser.add_argument('--edges', help="edge list file to serve instead of romania_map (see GraphLoader.py)")
+    parser.add_argument('--locations', help="node coordinates file for --edges")
+    parser.add_argument('--directed', action='store_true', help="the --edges file lists one way edges")
+    args = parser.parse_args()
+
+    if args.edges:
+        from GraphLoader import load_edge_list, load_locations
+        graph = load_edge_list(args.edges, directed=args.directed)
+        if args.locations:
+            load_locations(args.locations, graph)
+    else:
+        from romania_map import romania_map
+        graph = romania_map
+
+    service = RoutingService(graph, args.workers, args.processes, args.max_pending, args.timeout)
+    print("Serving on http://%s:%d" % (args.host, args.port))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
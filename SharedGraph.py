@@ -0,0 +1,112 @@
+from multiprocessing import shared_memory
+from GraphSnapshot import GraphSnapshot
+
+############################################################################################################
+# This file contains the SharedGraph class which publishes a graph once into shared memory so worker
+# processes can search it without each keeping their own copy.
+#
+# A Graph is a dict of dicts: every worker process that gets one (pickled, or inherited with fork, where
+# reference count updates soon copy the pages anyway) holds a full private copy. Instead the publishing
+# process lays the graph out in the GraphSnapshot format (CSR offsets, targets and weights, coordinates,
+# the name table and landmarks, see GraphSnapshot.py) in one multiprocessing.shared_memory block. Workers
+# attach to the block by name and get a CompactGraph whose arrays are read only memoryviews onto it, so
+# attaching only maps the block (no parsing or copying) and the graph takes the same memory however many
+# workers attach. Each worker still builds its own small caches (heuristic tables, the name to id dict)
+# as it searches.
+#
+# Usage example:
+#     shared = SharedGraph.publish(romania_map)      # in the parent, keep it until the workers are done
+#     ... start workers with shared.name ...
+#     graph = SharedGraph.attach(name).graph         # in a worker, nodes are ids (see CompactGraph)
+#     ...
+#     shared.close()
+#     shared.unlink()                                # in the parent, frees the block
+############################################################################################################
+
+
+# opens an existing shared memory block without handing it to the resource tracker, so it stays until
+# the publishing process unlinks it. Before Python 3.13 (no track=False) it is handed to the tracker, which
+# is fine for multiprocessing workers as they share the publishing process's tracker, but a process started
+# some other way frees the block when it exits.
+def open_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name)
+
+
+############################################################################################################
+# SharedGraph class
+############################################################################################################
+
+class SharedGraph:
+    # constructor takes the graph, the shared memory block behind it and the views onto that block
+    def __init__(self, graph, memory, views, owner=False):
+        self.graph = graph
+        self.memory = memory
+        self.views = views
+        self.owner = owner
+        self.name = memory.name
+
+    # method to copy a Graph or CompactGraph (and its landmarks) into a new shared memory block
+    # name is the block's name, None lets the system choose one (see the name attribute)
+    @classmethod
+    def publish(cls, graph, landmarks=None, name=None):
+        size, parts = GraphSnapshot.layout(graph, landmarks)
+        memory = shared_memory.SharedMemory(name, create=True, size=size)
+        try:
+            for offset, data in parts:
+                memory.buf[offset:offset + len(data)] = data
+            graph, views = cls.read(memory)
+        except BaseException:
+            memory.close()
+            memory.unlink()
+            raise
+        return cls(graph, memory, views, owner=True)
+
+    # method to attach to a block published under name, the graph's arrays are read only views onto it
+    @classmethod
+    def attach(cls, name):
+        memory = open_shared_memory(name)
+        try:
+            graph, views = cls.read(memory)
+        except ValueError:
+            memory.close()
+            raise ValueError(f"shared memory block {name} does not hold a graph")
+        return cls(graph, memory, views)
+
+    # method to read the graph in a block through a read only view, the view is released last
+    @staticmethod
+    def read(memory):
+        view = memory.buf.toreadonly()
+        try:
+            graph, views = GraphSnapshot.read(view)
+        except ValueError:
+            view.release()
+            raise
+        return graph, [view] + views
+
+    # method to detach from the block, the graph can no longer be used afterwards
+    def close(self):
+        if self.views is not None:
+            GraphSnapshot.release(self.graph, self.views)
+            self.views = None
+            self.memory.close()
+
+    # method to free the block once every process is done with it, only the publishing process does this
+    def unlink(self):
+        if self.owner:
+            self.memory.unlink()
+            self.owner = False
+
+    def __enter__(self):
+        return self
+
+    # leaving a with block detaches, and frees the block if this process published it
+    def __exit__(self, *exc_info):
+        self.close()
+        self.unlink()
+
+############################################################################################################
+# End of SharedGraph class
+############################################################################################################
@@ -1,18 +1,34 @@
-
 import random
 import math
-from math import radians, sin, cos, sqrt, atan
+from math import radians, sin, cos, sqrt, atan, asin
 import heapq
+import time
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import json
+
+# NumPy is optional, the vectorized haversine functions fall back to plain Python loops without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 ############################################################################################################
 # This file contains the SimpleProblemSolvingAgent class which is a simple 
 # problem solving agent that contains methods to perform different search strategies.
  
 # SimpleProblemSolvingAgent contains methods to perform Greedy Best-First Search, A* Search, 
-# Hill Climbing Search, and Simulated Annealing Search.
+# Bidirectional A* Search, Contraction Hierarchy and Distance Matrix lookups, Hill Climbing Search, 
+# and Simulated Annealing Search.
 
 # The file also contains helper functions to create an undirected graph, a graph class 
-# to represent the map of Romania, a priority queue, and the haversine formula to 
+# to represent the map of Romania, a compact integer-indexed form of that graph for large road networks,
+# a priority queue, and the haversine formula to 
 # calculate the distance between two points on the Earth from their latitude and longitude.
 ############################################################################################################
 
@@ -22,16 +38,258 @@ import heapq
 ############################################################################################################
 
 
+############################################################################################################
+# Heuristic table
+# dictionary of heuristic values (distance from each city to one goal city). 
+# Values are computed the first time a city is looked up, so a search only pays for the cities it touches.
+############################################################################################################
+
+class HeuristicTable(dict):
+    # constructor takes in the graph and the goal city the heuristics are measured to
+    # with reverse=True the heuristics are measured from the goal city instead (estimates of cost(goal, city))
+    def __init__(self, graph, goal, reverse=False):
+        super().__init__()
+        self.graph = graph
+        self.goal = goal
+        self.reverse = reverse
+        self.complete = False
+
+    # method called by dict when a city is not in the table yet
+    def __missing__(self, node):
+        if self.reverse:
+            value = self.graph.heuristic(node, self.goal)
+        else:
+            value = self.graph.heuristic(self.goal, node)
+        self[node] = value
+        return value
+
+    # method to compute the heuristic of every city at once with the vectorized haversine
+    def fill(self):
+        nodes = list(self.graph.nodes())
+        if self.reverse:
+            for node in nodes:
+                if node not in self:
+                    self.__missing__(node)
+        else:
+            self.update(zip(nodes, self.graph.heuristics(self.goal, nodes)))
+        self.complete = True
+
+############################################################################################################
+# End of Heuristic table
+############################################################################################################
+
+
+############################################################################################################
+# Heuristic cache
+# keeps the heuristic tables of the most recently used goal cities of a graph, so agents 
+# routing to the same goal share one table. The least recently used table is evicted once 
+# more than maxsize goals are cached.
+############################################################################################################
+
+class HeuristicCache:
+    # constructor
+    def __init__(self, graph, maxsize=128):
+        self.graph = graph
+        self.maxsize = maxsize
+        self.tables = OrderedDict()
+        # agents on several threads (e.g. RoutingService) share the cache of their graph
+        self.lock = threading.Lock()
+
+    # method to get the heuristic table of a goal city, creating it if it is not cached
+    # on undirected graphs the estimates are symmetric, so reverse tables are the forward tables
+    def table(self, goal, complete=False, reverse=False):
+        reverse = reverse and self.graph.directed
+        key = (goal, reverse)
+        with self.lock:
+            table = self.tables.get(key)
+            if table is None:
+                table = HeuristicTable(self.graph, goal, reverse)
+                self.tables[key] = table
+                if len(self.tables) > self.maxsize:
+                    self.tables.popitem(last=False)
+            else:
+                self.tables.move_to_end(key)
+        if complete and not table.complete:
+            table.fill()
+        return table
+
+    # method to drop all cached tables, e.g. after the graph's locations change
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+
+    # a lock cannot be pickled, so a graph sent to another process gets a cache with a new lock
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+############################################################################################################
+# End of Heuristic cache
+############################################################################################################
+
+
+############################################################################################################
+# Route cache
+# remembers the (path, cost) results of searches on one graph, keyed on the start city, goal city, 
+# strategy and search options. The least recently used results are evicted once more than maxsize 
+# results are cached or their estimated size passes max_bytes.
+#
+# Results of the optimal strategies (OPTIMAL_STRATEGIES) also answer their subpaths for any of those
+# strategies: every part of a shortest path is itself a shortest path, so a cached Arad → Bucharest 
+# route answers Sibiu → Pitesti.
+# Results are only kept for one graph version. Changing an edge with Graph.connect bumps graph.version,
+# and the cache drops everything it holds the next time it is used.
+############################################################################################################
+
+OPTIMAL_STRATEGIES = ('a_star', 'bidirectional_a_star', 'ch', 'distance_matrix')
+
+class RouteCache:
+    # constructor
+    def __init__(self, graph, maxsize=1024, max_bytes=None):
+        self.graph = graph
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.version = graph.version
+        self.results = OrderedDict()
+        self.through = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    # method to get a cached result, or None if there is none
+    def get(self, start_city, goal_city, strategy, options=None):
+        self.check_version()
+        key = self.key(start_city, goal_city, strategy, options)
+        if key is None:
+            return None
+        entry = self.results.get(key)
+        if entry is not None:
+            self.results.move_to_end(key)
+            self.hits += 1
+            return list(entry[0]), entry[1]
+
+        # look for a cached shortest path that passes through the start city and later the goal city
+        if strategy in OPTIMAL_STRATEGIES:
+            for other in self.through.get(start_city, ()):
+                path, cost, positions, costs, size = self.results[other]
+                i = positions[start_city]
+                j = positions.get(goal_city, -1)
+                if j >= i:
+                    self.results.move_to_end(other)
+                    self.hits += 1
+                    return path[i:j + 1], costs[j] - costs[i]
+
+        self.misses += 1
+        return None
+
+    # method to cache the result of a search
+    def put(self, start_city, goal_city, strategy, options, result):
+        self.check_version()
+        key = self.key(start_city, goal_city, strategy, options)
+        if key is None or not isinstance(result, tuple):
+            return
+        if key in self.results:
+            self.remove(key)
+        path, cost = result
+        path = list(path)
+        positions = costs = None
+        size = sys.getsizeof(path)
+
+        # index the nodes of a shortest path with their position and the cost of reaching them
+        if strategy in OPTIMAL_STRATEGIES and len(path) > 2:
+            positions = {}
+            costs = [0]
+            for a, b in zip(path, path[1:]):
+                costs.append(costs[-1] + self.graph.cost(a, b))
+            for i, node in enumerate(path):
+                positions.setdefault(node, i)
+                self.through.setdefault(node, set()).add(key)
+            size += sys.getsizeof(positions) + sys.getsizeof(costs)
+
+        self.results[key] = (path, cost, positions, costs, size)
+        self.size += size
+        while len(self.results) > self.maxsize or (self.max_bytes is not None and self.size > self.max_bytes and len(self.results) > 1):
+            self.remove(next(iter(self.results)))
+
+    # method to drop all cached results
+    def clear(self):
+        self.results.clear()
+        self.through.clear()
+        self.size = 0
+
+    # key of a search, None when its options cannot be hashed or it would not give the same result again
+    # ara_star is not cached as its result depends on how far it got before the deadline
+    def key(self, start_city, goal_city, strategy, options):
+        if strategy == 'ara_star':
+            return None
+        options = tuple(sorted(options.items())) if options else ()
+        if strategy == 'simulated_annealing' and dict(options).get('seed') is None:
+            return None
+        try:
+            hash(options)
+        except TypeError:
+            return None
+        return (start_city, goal_city, strategy, options)
+
+    # method to remove one cached result
+    def remove(self, key):
+        path, cost, positions, costs, size = self.results.pop(key)
+        self.size -= size
+        if positions is not None:
+            for node in positions:
+                keys = self.through[node]
+                keys.discard(key)
+                if not keys:
+                    del self.through[node]
+
+    # every result is stale once the graph has changed since they were cached
+    def check_version(self):
+        if self.graph.version != self.version:
+            self.clear()
+            self.version = self.graph.version
+
+############################################################################################################
+# End of Route cache
+############################################################################################################
+
+
 ############################################################################################################
 # Graph class
 # Represents the map of Romania
+# Every change made with connect is counted in version and the last CHANGE_LOG_SIZE changed edges are
+# kept in changes, so caches and incremental searches can tell what changed since they last looked.
+# The nodes and their degrees are kept up to date by connect, so has_node, degree and node_count are O(1).
+# Edges must therefore be added with connect, not by changing graph_dict directly.
 ############################################################################################################
 
+CHANGE_LOG_SIZE = 100000
+
 class Graph:
     # constructor
     def __init__(self, graph_dict=None, directed=True):
-        self.graph_dict = graph_dict
+        self.graph_dict = graph_dict if graph_dict is not None else {}
         self.directed = directed
+        self.heuristic_cache = HeuristicCache(self)
+        self.reverse_dict = None
+        self.landmarks = None
+        self.version = 0
+        self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+
+        # every node (keys in insertion order) with the number of edges leaving and entering it
+        self.out_degrees = {}
+        self.in_degrees = {}
+        for a, links in self.graph_dict.items():
+            self.add_node(a)
+            self.out_degrees[a] += len(links)
+            for b in links:
+                self.add_node(b)
+                self.in_degrees[b] += 1
+
         if not directed:
             self.make_undirected()
 
@@ -49,11 +307,47 @@ class Graph:
 
     # method to connect two nodes
     def connect1(self, A, B, distance):
-        self.graph_dict.setdefault(A, {})[B] = distance
-
-    # method to get the links of a node
+        links = self.graph_dict.setdefault(A, {})
+        old = links.get(B)
+        if B not in links:
+            self.add_node(A)
+            self.add_node(B)
+            self.out_degrees[A] += 1
+            self.in_degrees[B] += 1
+        links[B] = distance
+        # a new or cheaper edge can make landmark costs overestimate, so they no longer give a valid heuristic
+        if self.landmarks is not None and (old is None or distance < old):
+            self.use_landmarks(None)
+        if self.reverse_dict is not None:
+            self.reverse_dict.setdefault(B, {})[A] = distance
+        # cached routes (see RouteCache) are only valid for the version they were found on
+        self.version += 1
+        self.changes.append((self.version, A, B))
+
+    # method to get the (A, B) edges changed since a graph version, oldest first
+    # returns None when the change log no longer goes back that far
+    def changes_since(self, version):
+        changed = []
+        for changed_version, A, B in reversed(self.changes):
+            if changed_version <= version:
+                break
+            changed.append((A, B))
+        else:
+            if version < self.version - len(self.changes):
+                return None
+        changed.reverse()
+        return changed
+
+    # method to register a node with no edges yet
+    def add_node(self, node):
+        if node not in self.out_degrees:
+            self.out_degrees[node] = 0
+            self.in_degrees[node] = 0
+
+    # method to get the links of a node, or the cost of the link to b
+    # reading never adds the node to graph_dict, a node without links gets an empty dict
     def get(self, a, b=None):
-        links = self.graph_dict.setdefault(a, {})
+        links = self.graph_dict.get(a, {})
         if b is None:
             return links
         else:
@@ -61,26 +355,84 @@ class Graph:
 
     # method to get the nodes of the graph
     def nodes(self):
-        s1 = set([k for k in self.graph_dict.keys()])
-        s2 = set([k2 for v in self.graph_dict.values() for k2, v2 in v.items()])
-        nodes = s1.union(s2)
-        return list(nodes)
+        return list(self.out_degrees)
+
+    # method to check whether a node is in the graph
+    def has_node(self, node):
+        return node in self.out_degrees
+
+    # method to get the number of edges leaving a node, or entering it with incoming=True
+    # every edge of an undirected graph is stored in both directions, so both are the number of neighbors
+    def degree(self, node, incoming=False):
+        return self.in_degrees[node] if incoming else self.out_degrees[node]
+
+    # method to get the number of nodes
+    def node_count(self):
+        return len(self.out_degrees)
 
     # method to get the cost of a node
     def cost(self, current, next):
         return self.graph_dict[current][next]
 
     # method to get the heuristic of a node
+    # with landmarks attached the heuristic is the larger of the haversine and landmark lower bounds
     def heuristic(self, goal, node):
         locs = getattr(self, 'locations', None)
         if locs:
-            return int(haversine(locs[goal], locs[node]))
+            value = int(haversine(locs[goal], locs[node]))
+        else:
+            value = 0
+        if self.landmarks is not None:
+            value = max(value, self.landmarks.bound(goal, node))
+        return value
+
+    # method to get the heuristics of many nodes in one vectorized haversine call
+    def heuristics(self, goal, nodes):
+        locs = getattr(self, 'locations', None)
+        if locs:
+            latitudes, longitudes = self.coordinates(nodes)
+            values = truncate_distances(haversine_many(locs[goal], latitudes, longitudes))
         else:
-            return 0
+            values = [0] * len(nodes)
+        if self.landmarks is not None:
+            values = [max(value, bound) for value, bound in zip(values, self.landmarks.bounds(goal, nodes))]
+        return values
+
+    # method to attach landmark distances (see Landmarks) to the heuristic, or detach them with None
+    def use_landmarks(self, landmarks):
+        self.landmarks = landmarks
+        self.heuristic_cache.clear()
+
+    # method to get the latitude and longitude arrays of a list of nodes
+    def coordinates(self, nodes):
+        locs = self.locations
+        return [locs[node][0] for node in nodes], [locs[node][1] for node in nodes]
+
+    # method to get the shared heuristic table for a goal
+    # with complete=True the whole table is filled in one vectorized call instead of lazily
+    # with reverse=True the table estimates the cost from the goal to each node instead
+    def heuristic_table(self, goal, complete=False, reverse=False):
+        return self.heuristic_cache.table(goal, complete, reverse)
 
     # method to get the neighbors of a node
     def neighbors(self, node):
-        return self.graph_dict[node].keys()
+        return self.graph_dict.get(node, {}).keys()
+
+    # method to get the (neighbor, cost) pairs of a node
+    def edges(self, node):
+        return self.graph_dict.get(node, {}).items()
+
+    # method to get the (predecessor, cost) pairs of the edges leading into a node
+    # an undirected graph stores both directions, a directed graph builds a reversed adjacency dict on first use
+    def incoming(self, node):
+        if not self.directed:
+            return self.edges(node)
+        if self.reverse_dict is None:
+            self.reverse_dict = {}
+            for a, links in self.graph_dict.items():
+                for b, dist in links.items():
+                    self.reverse_dict.setdefault(b, {})[a] = dist
+        return self.reverse_dict.get(node, {}).items()
 
 ############################################################################################################
 # End of Graph class
@@ -94,11 +446,216 @@ class Graph:
 def UndirectedGraph(graph_dict=None):
     return Graph(graph_dict=graph_dict, directed=False)
 
+# checks whether every edge of a graph costs a whole number of the int type (like romania_map), the
+# stores that keep costs as float64 (DistanceMatrix, CompactGraph) use it to give int costs back
+def integer_costs(graph):
+    return isinstance(graph, Graph) and all(type(cost) is int for links in graph.graph_dict.values() for cost in links.values())
+
 ############################################################################################################
 # End of Undirected graph
 ############################################################################################################
 
 
+############################################################################################################
+# Compact graph class
+# Represents a frozen graph in compressed sparse row (CSR) form. Node names are interned to 
+# integer ids 0..n-1, and the outgoing edges of node i are targets[offsets[i]:offsets[i + 1]] 
+# with matching weights. Each row is sorted by target id so cost() can binary search it.
+# Nodes are integer ids, so a SimpleProblemSolvingAgent built on a CompactGraph takes 
+# ids for its start and goal cities and returns paths of ids (see id_of and path_names).
+############################################################################################################
+
+class CompactGraph:
+    # constructor takes the name table and the CSR buffers (array, memoryview or NumPy arrays)
+    def __init__(self, names, offsets, targets, weights, latitudes=None, longitudes=None, directed=True):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.directed = directed
+        self.ids = None
+        self.heuristic_cache = HeuristicCache(self)
+        self.reverse_graph = None
+        self.landmarks = None
+        # a compact graph is never changed, so its version stays 0
+        self.version = 0
+
+    # method to build a compact graph from a Graph
+    @classmethod
+    def from_graph(cls, graph):
+        try:
+            names = sorted(graph.nodes())
+        except TypeError:
+            # names of different types (e.g. int and tuple nodes) cannot be compared, order them by repr
+            names = sorted(graph.nodes(), key=repr)
+        ids = {name: i for i, name in enumerate(names)}
+        sources = array('i')
+        targets = array('i')
+        weights = array('d')
+        for a, links in graph.graph_dict.items():
+            for b, dist in links.items():
+                sources.append(ids[a])
+                targets.append(ids[b])
+                weights.append(dist)
+        locations = getattr(graph, 'locations', None)
+        return cls.from_edges(names, sources, targets, weights, locations, graph.directed)
+
+    # method to build a compact graph from parallel source, target and weight sequences of node ids
+    # edges are bucketed by source with a counting sort, so no per-node Python containers are created
+    @classmethod
+    def from_edges(cls, names, sources, targets, weights, locations=None, directed=True):
+        n = len(names)
+        offsets = array('q', bytes(8 * (n + 1)))
+        for a in sources:
+            offsets[a + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+
+        # place each edge in its source row
+        fill = array('q', offsets[:n])
+        row_targets = array('i', bytes(4 * len(sources)))
+        row_weights = array('d', bytes(8 * len(sources)))
+        for a, b, dist in zip(sources, targets, weights):
+            position = fill[a]
+            row_targets[position] = b
+            row_weights[position] = dist
+            fill[a] = position + 1
+
+        # sort each row by target id
+        for i in range(n):
+            start, end = offsets[i], offsets[i + 1]
+            if end - start > 1:
+                row = sorted(zip(row_targets[start:end], row_weights[start:end]))
+                row_targets[start:end] = array('i', [b for b, dist in row])
+                row_weights[start:end] = array('d', [dist for b, dist in row])
+
+        latitudes = longitudes = None
+        if locations:
+            latitudes = array('d', [locations[name][0] if name in locations else float('nan') for name in names])
+            longitudes = array('d', [locations[name][1] if name in locations else float('nan') for name in names])
+        return cls(names, offsets, row_targets, row_weights, latitudes, longitudes, directed)
+
+    # method to get the id of a node name
+    def id_of(self, name):
+        if self.ids is None:
+            self.ids = {name: i for i, name in enumerate(self.names)}
+        return self.ids[name]
+
+    # method to get the edges changed since a graph version, a compact graph never changes
+    def changes_since(self, version):
+        return []
+
+    # method to get the name of a node id
+    def name_of(self, node):
+        return self.names[node]
+
+    # method to turn a path of node ids into a path of node names
+    def path_names(self, path):
+        return [self.names[node] for node in path]
+
+    # method to get the nodes of the graph
+    def nodes(self):
+        return range(len(self.names))
+
+    # method to check whether a node id is in the graph
+    def has_node(self, node):
+        return isinstance(node, int) and 0 <= node < len(self.names)
+
+    # method to get the number of edges leaving a node, or entering it with incoming=True
+    def degree(self, node, incoming=False):
+        if incoming and self.directed:
+            return self.reverse().degree(node)
+        return self.offsets[node + 1] - self.offsets[node]
+
+    # method to get the number of nodes
+    def node_count(self):
+        return len(self.names)
+
+    # method to get the cost of an edge
+    def cost(self, current, next):
+        start, end = self.offsets[current], self.offsets[current + 1]
+        position = bisect_left(self.targets, next, start, end)
+        if position == end or self.targets[position] != next:
+            raise KeyError(next)
+        return self.weights[position]
+
+    # method to get the heuristic of a node
+    # with landmarks attached the heuristic is the larger of the haversine and landmark lower bounds
+    # nodes without coordinates (NaN) get 0, like a Graph without locations
+    def heuristic(self, goal, node):
+        if self.latitudes is not None:
+            distance = haversine((self.latitudes[goal], self.longitudes[goal]), (self.latitudes[node], self.longitudes[node]))
+            value = int(distance) if distance == distance else 0
+        else:
+            value = 0
+        if self.landmarks is not None:
+            value = max(value, self.landmarks.bound(goal, node))
+        return value
+
+    # method to get the heuristics of many nodes in one vectorized haversine call
+    def heuristics(self, goal, nodes):
+        if self.latitudes is not None:
+            latitudes, longitudes = self.coordinates(nodes)
+            values = truncate_distances(haversine_many((self.latitudes[goal], self.longitudes[goal]), latitudes, longitudes))
+        else:
+            values = [0] * len(nodes)
+        if self.landmarks is not None:
+            values = [max(value, bound) for value, bound in zip(values, self.landmarks.bounds(goal, nodes))]
+        return values
+
+    # method to attach landmark distances (see Landmarks) to the heuristic, or detach them with None
+    def use_landmarks(self, landmarks):
+        self.landmarks = landmarks
+        self.heuristic_cache.clear()
+
+    # method to get the latitude and longitude arrays of a list of nodes
+    def coordinates(self, nodes):
+        if np is not None:
+            nodes = np.asarray(nodes, dtype=np.intp)
+            return np.asarray(self.latitudes)[nodes], np.asarray(self.longitudes)[nodes]
+        return [self.latitudes[node] for node in nodes], [self.longitudes[node] for node in nodes]
+
+    # method to get the shared heuristic table for a goal
+    # with complete=True the whole table is filled in one vectorized call instead of lazily
+    # with reverse=True the table estimates the cost from the goal to each node instead
+    def heuristic_table(self, goal, complete=False, reverse=False):
+        return self.heuristic_cache.table(goal, complete, reverse)
+
+    # method to get the neighbors of a node
+    def neighbors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    # method to get the (neighbor, cost) pairs of a node
+    def edges(self, node):
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    # method to get the (predecessor, cost) pairs of the edges leading into a node
+    def incoming(self, node):
+        if not self.directed:
+            return self.edges(node)
+        return self.reverse().edges(node)
+
+    # method to get the graph with every edge reversed, built once and kept
+    def reverse(self):
+        if not self.directed:
+            return self
+        if self.reverse_graph is None:
+            sources = array('i')
+            for a in range(len(self.names)):
+                sources.extend([a] * (self.offsets[a + 1] - self.offsets[a]))
+            self.reverse_graph = CompactGraph.from_edges(self.names, self.targets, sources, self.weights, directed=True)
+            self.reverse_graph.latitudes = self.latitudes
+            self.reverse_graph.longitudes = self.longitudes
+        return self.reverse_graph
+
+############################################################################################################
+# End of Compact graph class
+############################################################################################################
+
+
 ############################################################################################################
 # Haversine formula
 # Calculatea the distance between two points on the Earth from their latitude and longitude
@@ -114,67 +671,850 @@ def haversine(coord1, coord2):
     a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
     return 2 * R * atan(sqrt(a))
 
+# the standard form of the formula, 2R·asin(√a), used for the distances reported by CalcAllDistances.py
+def haversine_arcsin(coord1, coord2):
+    R = 6371
+    lat1, lon1 = coord1
+    lat2, lon2 = coord2
+    phi1, phi2 = radians(lat1), radians(lat2)
+    dphi = radians(lat2 - lat1)
+    dlambda = radians(lon2 - lon1)
+    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
+    return 2 * R * asin(sqrt(a))
+
 ############################################################################################################
 # End of haversine formula
 ############################################################################################################
 
 
+############################################################################################################
+# Vectorized haversine formula
+# Same formula as haversine (haversine_arcsin with arcsin=True), applied to whole arrays of latitudes and
+# longitudes in one call.
+# haversine_array works element by element (and broadcasts with NumPy), haversine_many measures 
+# one point to many points and haversine_matrix measures every point of one set to every point of another.
+# Returns NumPy arrays when NumPy is installed and lists otherwise.
+############################################################################################################
+
+def haversine_array(lat1, lon1, lat2, lon2, arcsin=False):
+    R = 6371
+    if np is None:
+        columns = [value if isinstance(value, (list, tuple, range, array)) else None for value in (lat1, lon1, lat2, lon2)]
+        size = max(len(column) for column in columns if column is not None)
+        lat1, lon1, lat2, lon2 = [column if column is not None else [value] * size for column, value in zip(columns, (lat1, lon1, lat2, lon2))]
+        distance = haversine_arcsin if arcsin else haversine
+        return [distance((a1, o1), (a2, o2)) for a1, o1, a2, o2 in zip(lat1, lon1, lat2, lon2)]
+    lat1, lon1, lat2, lon2 = [np.asarray(value, dtype=float) for value in (lat1, lon1, lat2, lon2)]
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * R * (np.arcsin if arcsin else np.arctan)(np.sqrt(a))
+
+# distances from one (lat, lon) point to every point of the latitude/longitude arrays
+def haversine_many(origin, latitudes, longitudes):
+    return haversine_array(origin[0], origin[1], latitudes, longitudes)
+
+# len(latitudes1) x len(latitudes2) matrix of distances between two sets of points
+def haversine_matrix(latitudes1, longitudes1, latitudes2, longitudes2):
+    if np is None:
+        return [haversine_many((lat, lon), latitudes2, longitudes2) for lat, lon in zip(latitudes1, longitudes1)]
+    latitudes1 = np.asarray(latitudes1, dtype=float)[:, None]
+    longitudes1 = np.asarray(longitudes1, dtype=float)[:, None]
+    return haversine_array(latitudes1, longitudes1, np.asarray(latitudes2, dtype=float)[None, :], np.asarray(longitudes2, dtype=float)[None, :])
+
+# haversine length of every edge of a Graph with locations, as a list of (city, neighbor, distance)
+# computed with the standard asin form (see haversine_arcsin) so the report keeps its values
+def haversine_edge_weights(graph):
+    pairs = [(a, b) for a, links in graph.graph_dict.items() for b in links]
+    latitudes1, longitudes1 = graph.coordinates([a for a, b in pairs])
+    latitudes2, longitudes2 = graph.coordinates([b for a, b in pairs])
+    distances = haversine_array(latitudes1, longitudes1, latitudes2, longitudes2, arcsin=True)
+    return [(a, b, float(distance)) for (a, b), distance in zip(pairs, distances)]
+
+# truncate an array of distances to integer heuristic values like Graph.heuristic does
+# a distance to a node without coordinates (NaN) becomes 0
+def truncate_distances(distances):
+    if np is None:
+        return [int(distance) if distance == distance else 0 for distance in distances]
+    return np.trunc(np.nan_to_num(distances, nan=0.0)).astype(int).tolist()
+
+############################################################################################################
+# End of vectorized haversine formula
+############################################################################################################
+
+
 ############################################################################################################
 # Priority Queue
-# class to represent a priority queue
+# class to represent a priority queue as an indexed binary heap.
+# put, get and priority updates (decrease-key) are O(log n), and removed items are deleted lazily.
 ############################################################################################################
 
 class PriorityQueue:
+    # marker left in a heap entry whose item has been lazily removed
+    REMOVED = object()
+
     # constructor
+    # heap holds [priority, count, item] entries, index maps each live item to its position in the heap
     def __init__(self):
-        self.elements = []
+        self.heap = []
+        self.index = {}
+        self.count = 0
+        self.stale = 0
 
     # method to check if the queue is empty
     def empty(self):
-        return len(self.elements) == 0
+        return len(self.index) == 0
+
+    # method to get the number of live items in the queue
+    def __len__(self):
+        return len(self.index)
+
+    # method to check if an item is in the queue
+    def __contains__(self, item):
+        return item in self.index
+
+    # method to get the priority of an item in the queue
+    def priority(self, item):
+        return self.heap[self.index[item]][0]
 
     # method to put an item in the queue
+    # if the item is already queued its priority is updated in place (decrease-key or increase-key)
     def put(self, item, priority):
-        self.elements.append((item, priority))
-        self.elements.sort(key=lambda x: x[1])
+        self.count += 1
+        if item in self.index:
+            position = self.index[item]
+            entry = self.heap[position]
+            old_priority = entry[0]
+            entry[0] = priority
+            entry[1] = self.count
+            if priority < old_priority:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
+        else:
+            self.heap.append([priority, self.count, item])
+            self.index[item] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
 
-    # method to get an item from the queue
+    # method to get the item with the lowest priority from the queue
     def get(self):
-        return self.elements.pop(0)[0]
+        return self.pop()[0]
+
+    # method to get the item with the lowest priority and its priority from the queue
+    def pop(self):
+        while self.heap:
+            priority, count, item = self._pop_root()
+            if item is not PriorityQueue.REMOVED:
+                del self.index[item]
+                return item, priority
+            self.stale -= 1
+        raise KeyError('pop from an empty priority queue')
+
+    # method to look at the item with the lowest priority without removing it
+    def peek(self):
+        while self.heap and self.heap[0][2] is PriorityQueue.REMOVED:
+            self._pop_root()
+            self.stale -= 1
+        if not self.heap:
+            raise KeyError('peek at an empty priority queue')
+        return self.heap[0][2], self.heap[0][0]
+
+    # method to remove an item from the queue
+    # the entry is only marked as removed and is discarded when it reaches the top of the heap
+    def remove(self, item):
+        position = self.index.pop(item)
+        self.heap[position][2] = PriorityQueue.REMOVED
+        self.stale += 1
+        # compact the heap once stale entries make up more than half of it
+        if self.stale > len(self.index):
+            self._compact()
+
+    # method to remove the root entry of the heap and restore the heap property
+    def _pop_root(self):
+        last = self.heap.pop()
+        if not self.heap:
+            return last
+        root = self.heap[0]
+        self.heap[0] = last
+        if last[2] is not PriorityQueue.REMOVED:
+            self.index[last[2]] = 0
+        self._sift_down(0)
+        return root
+
+    # method to drop all removed entries and rebuild the heap
+    def _compact(self):
+        self.heap = [entry for entry in self.heap if entry[2] is not PriorityQueue.REMOVED]
+        self.stale = 0
+        for position in range(len(self.heap) // 2 - 1, -1, -1):
+            self._sift_down(position)
+        for position, entry in enumerate(self.heap):
+            self.index[entry[2]] = position
+
+    # method to move an entry towards the root until its parent is not larger
+    # entries compare as lists, so ties on priority are broken by insertion count and never reach the item
+    def _sift_up(self, position):
+        heap = self.heap
+        entry = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if heap[parent] < entry:
+                break
+            heap[position] = heap[parent]
+            self._set_index(position)
+            position = parent
+        heap[position] = entry
+        self._set_index(position)
+
+    # method to move an entry towards the leaves until neither child is smaller
+    def _sift_down(self, position):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry < heap[child]:
+                break
+            heap[position] = heap[child]
+            self._set_index(position)
+            position = child
+        heap[position] = entry
+        self._set_index(position)
+
+    # method to record the heap position of the entry at position
+    def _set_index(self, position):
+        item = self.heap[position][2]
+        if item is not PriorityQueue.REMOVED:
+            self.index[item] = position
 
 ############################################################################################################
 # End of Priority Queue
 ############################################################################################################
 
 
+############################################################################################################
+# Search statistics
+# opt-in record of what one search did, pass one to SimpleProblemSolvingAgent.search(strategy, stats=...).
+#     expanded              - nodes expanded (moves made for hill climbing, restarts run for simulated annealing)
+#     pushes, pops          - priority queue insertions/updates and removals
+#     peak_frontier         - largest number of nodes queued at once (both directions for bidirectional searches)
+#     heuristic_evaluations - heuristic values looked up
+#     cache_hits            - 1 when the result came from a RouteCache instead of a search (then the rest stay 0)
+#     setup_time, search_time, reconstruct_time - wall time in seconds of each phase
+# When the search finishes the stats are passed to sink (any callable taking a dict, e.g. a StatsSummary).
+# Searches without a stats object use the plain queue and heuristic table, so they pay nothing for this.
+############################################################################################################
+
+class SearchStats:
+    # constructor
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.strategy = None
+        self.expanded = 0
+        self.pushes = 0
+        self.pops = 0
+        self.frontier = 0
+        self.peak_frontier = 0
+        self.heuristic_evaluations = 0
+        self.cache_hits = 0
+        self.setup_time = 0.0
+        self.search_time = 0.0
+        self.reconstruct_time = 0.0
+        self.mark = None
+
+    # method to start timing a search, the setup phase runs until the first lap
+    def begin(self, strategy):
+        self.strategy = strategy
+        self.mark = time.perf_counter()
+
+    # method to add the time since the last lap to a phase ('setup', 'search' or 'reconstruct')
+    def lap(self, phase):
+        now = time.perf_counter()
+        setattr(self, phase + '_time', getattr(self, phase + '_time') + now - self.mark)
+        self.mark = now
+
+    # method to end the search, time not covered by a lap counts as reconstruction, then notify the sink
+    def finish(self):
+        self.lap('reconstruct')
+        if self.sink is not None:
+            self.sink(self.as_dict())
+
+    # method to count a node that was added to a frontier
+    def queued(self):
+        self.frontier += 1
+        if self.frontier > self.peak_frontier:
+            self.peak_frontier = self.frontier
+
+    # method to get the stats as a dictionary
+    def as_dict(self):
+        return {
+            'strategy': self.strategy,
+            'expanded': self.expanded,
+            'pushes': self.pushes,
+            'pops': self.pops,
+            'peak_frontier': self.peak_frontier,
+            'heuristic_evaluations': self.heuristic_evaluations,
+            'cache_hits': self.cache_hits,
+            'setup_time': self.setup_time,
+            'search_time': self.search_time,
+            'reconstruct_time': self.reconstruct_time,
+            'total_time': self.setup_time + self.search_time + self.reconstruct_time,
+        }
+
+# priority queue that counts its operations into a SearchStats
+class CountingPriorityQueue(PriorityQueue):
+    # constructor
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    # method to put an item in the queue
+    def put(self, item, priority):
+        self.stats.pushes += 1
+        if item not in self.index:
+            self.stats.queued()
+        super().put(item, priority)
+
+    # method to get the item with the lowest priority and its priority from the queue
+    def pop(self):
+        entry = super().pop()
+        self.stats.pops += 1
+        self.stats.frontier -= 1
+        return entry
+
+    # method to remove an item from the queue
+    def remove(self, item):
+        super().remove(item)
+        self.stats.frontier -= 1
+
+# heuristic table wrapper that counts lookups into a SearchStats
+class CountingHeuristics:
+    # constructor
+    def __init__(self, table, stats):
+        self.table = table
+        self.stats = stats
+
+    # method to look up the heuristic of a city
+    def __getitem__(self, node):
+        self.stats.heuristic_evaluations += 1
+        return self.table[node]
+
+# sink that sums up the stats of many searches per strategy
+class StatsSummary:
+    # constructor
+    def __init__(self):
+        self.totals = {}
+
+    # method called with the stats of each finished search
+    def __call__(self, stats):
+        totals = self.totals.setdefault(stats['strategy'], {'searches': 0})
+        totals['searches'] += 1
+        for key, value in stats.items():
+            if key != 'strategy':
+                totals[key] = totals.get(key, 0) + value
+
+    # method to get the totals and per search averages of each strategy
+    def summary(self):
+        result = {}
+        for strategy, totals in self.totals.items():
+            result[strategy] = dict(totals)
+            for key, value in totals.items():
+                if key != 'searches':
+                    result[strategy]['mean_' + key] = value / totals['searches']
+        return result
+
+############################################################################################################
+# End of Search statistics
+############################################################################################################
+
+
+############################################################################################################
+# Dijkstra's algorithm
+# computes the cost of the shortest path from the source to every reachable node, and the 
+# came_from dictionary of the shortest path tree. With reverse=True it follows edges backwards, 
+# giving the cost of the shortest path from every node to the source.
+# The search can be bounded: it stops once every node in targets has been reached, and never 
+# settles a node that costs more than max_cost. A bounded search only returns settled nodes.
+############################################################################################################
+
+def dijkstra(graph, source, reverse=False, targets=None, max_cost=None):
+    frontier = PriorityQueue()
+    frontier.put(source, 0)
+    cost_so_far = {source: 0}
+    came_from = {source: None}
+    edges = graph.incoming if reverse else graph.edges
+    remaining = set(targets) if targets is not None else None
+
+    while not frontier.empty():
+        current, cost = frontier.peek()
+        if max_cost is not None and cost > max_cost:
+            break
+        frontier.get()
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        for next, step_cost in edges(current):
+            new_cost = cost + step_cost
+            if next not in cost_so_far or new_cost < cost_so_far[next]:
+                cost_so_far[next] = new_cost
+                came_from[next] = current, step_cost
+                frontier.put(next, new_cost)
+
+    # nodes still in the queue were reached but not settled, so their costs are not final yet
+    for node in list(frontier.index):
+        del cost_so_far[node]
+        del came_from[node]
+
+    return cost_so_far, came_from
+
+# follows a came_from dictionary back from the goal to the root of the tree
+def path_from_tree(came_from, goal):
+    path = [goal]
+    while came_from[path[-1]] is not None:
+        path.append(came_from[path[-1]][0])
+    return path[::-1]
+
+############################################################################################################
+# End of Dijkstra's algorithm
+############################################################################################################
+
+
+############################################################################################################
+# Landmarks (ALT - A*, Landmarks and Triangle inequality)
+# Offline preprocessing that picks k landmark nodes spread over the graph and stores the exact 
+# shortest path cost from every landmark to every node (and from every node to every landmark 
+# for directed graphs). By the triangle inequality, for any landmark L
+#     cost(node, goal) >= cost(L, goal) - cost(L, node)   and   cost(node, goal) >= cost(node, L) - cost(goal, L)
+# so the largest of these bounds is a consistent heuristic, even for graphs without locations.
+# Landmarks are chosen greedily, each one being the node farthest from the landmarks chosen before it.
+# Attach them to a graph with graph.use_landmarks(landmarks).
+############################################################################################################
+
+class Landmarks:
+    # constructor takes the node list, the landmark nodes and one list of costs per landmark, aligned with nodes
+    # unreachable nodes have a cost of infinity
+    def __init__(self, nodes, landmarks, from_landmarks, to_landmarks=None):
+        self.nodes = nodes
+        # nodes 0 .. n - 1 of a compact graph are their own index, so no dict is built for them
+        self.index = nodes if nodes == range(len(nodes)) else {node: i for i, node in enumerate(nodes)}
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks
+        self.to_landmarks = to_landmarks if to_landmarks is not None else from_landmarks
+
+    # method to select k landmarks and compute their shortest path costs
+    @classmethod
+    def build(cls, graph, k=8):
+        nodes = sorted(graph.nodes(), key=str)
+        if not nodes:
+            return cls(nodes, [], [], [])
+        index = {node: i for i, node in enumerate(nodes)}
+        landmarks = []
+        from_landmarks = []
+        to_landmarks = []
+
+        # closest landmark cost of every node, the next landmark is the node where it is largest
+        closest = [float('inf')] * len(nodes)
+        candidate = max(dijkstra(graph, nodes[0])[0].items(), key=lambda item: item[1])[0]
+
+        while len(landmarks) < min(k, len(nodes)):
+            landmarks.append(candidate)
+            from_costs = dijkstra(graph, candidate)[0]
+            from_row = array('d', [float('inf')]) * len(nodes)
+            for node, cost in from_costs.items():
+                from_row[index[node]] = cost
+            from_landmarks.append(from_row)
+            if graph.directed:
+                to_row = array('d', [float('inf')]) * len(nodes)
+                for node, cost in dijkstra(graph, candidate, reverse=True)[0].items():
+                    to_row[index[node]] = cost
+                to_landmarks.append(to_row)
+
+            # pick the node farthest from all landmarks so far (a node no landmark reaches counts as farthest)
+            best = -1
+            for i, cost in enumerate(from_row):
+                if cost < closest[i]:
+                    closest[i] = cost
+                if closest[i] > best and nodes[i] not in landmarks:
+                    candidate, best = nodes[i], closest[i]
+            if best < 0:
+                break
+
+        return cls(nodes, landmarks, from_landmarks, to_landmarks if graph.directed else None)
+
+    # method to get the landmark lower bound on the cost from node to goal
+    def bound(self, goal, node):
+        g = self.index[goal]
+        n = self.index[node]
+        best = 0
+        for from_row, to_row in zip(self.from_landmarks, self.to_landmarks):
+            # cost(L, goal) - cost(L, node), skipped when the landmark cannot reach the goal or the node
+            forward = from_row[g] - from_row[n]
+            if forward > best and forward != float('inf'):
+                best = forward
+            # cost(node, L) - cost(goal, L)
+            backward = to_row[n] - to_row[g]
+            if backward > best and backward != float('inf'):
+                best = backward
+        return best
+
+    # method to get the landmark lower bounds of many nodes
+    def bounds(self, goal, nodes):
+        if np is None or not self.landmarks:
+            return [self.bound(goal, node) for node in nodes]
+        g = self.index[goal]
+        positions = np.array([self.index[node] for node in nodes], dtype=np.intp)
+        from_rows = np.array(self.from_landmarks)
+        to_rows = np.array(self.to_landmarks)
+        with np.errstate(invalid='ignore'):
+            forward = from_rows[:, g][:, None] - from_rows[:, positions]
+            backward = to_rows[:, positions] - to_rows[:, g][:, None]
+        candidates = np.concatenate([forward, backward])
+        candidates[~np.isfinite(candidates)] = 0
+        return np.maximum(candidates.max(axis=0), 0).tolist()
+
+    # method to write the landmarks to a JSON file
+    def save(self, filename):
+        def row(values):
+            return [None if value == float('inf') else value for value in values]
+        data = {
+            'nodes': self.nodes,
+            'landmarks': self.landmarks,
+            'from_landmarks': [row(values) for values in self.from_landmarks],
+            'to_landmarks': [row(values) for values in self.to_landmarks] if self.to_landmarks is not self.from_landmarks else None,
+        }
+        with open(filename, 'w') as file:
+            json.dump(data, file)
+
+    # method to read landmarks written by save
+    @classmethod
+    def load(cls, filename):
+        def row(values):
+            return array('d', [float('inf') if value is None else value for value in values])
+        with open(filename) as file:
+            data = json.load(file)
+        to_landmarks = [row(values) for values in data['to_landmarks']] if data['to_landmarks'] is not None else None
+        return cls(data['nodes'], data['landmarks'], [row(values) for values in data['from_landmarks']], to_landmarks)
+
+############################################################################################################
+# End of Landmarks
+############################################################################################################
+
+
+############################################################################################################
+# Lifelong Planning A* (LPA*)
+# An A* search that keeps its state between calls. Every node has g, the cost it was last expanded with,
+# and rhs, the cost its predecessors currently offer (min of g(pred) + cost(pred, node)). Nodes where 
+# the two differ are inconsistent and queued on min(g, rhs) + heuristic. The first search expands the 
+# same nodes A* would. After edges change only the heads of the changed edges get a new rhs, and the 
+# next search re-expands just the part of the tree those changes made inconsistent.
+############################################################################################################
+
+class LPAStar:
+    # constructor takes the graph, the start and goal nodes and the heuristic table of the goal
+    def __init__(self, graph, start, goal, heuristics):
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.table = heuristics
+        self.heuristics = heuristics
+        self.reset()
+
+    # method to start over from an empty search tree
+    def reset(self):
+        self.g = {}
+        self.rhs = {self.start: 0}
+        self.queue = PriorityQueue()
+        self.queue.put(self.start, self.key(self.start))
+        self.version = self.graph.version
+
+    # priority of a node, ties are broken towards the smaller min(g, rhs)
+    def key(self, node):
+        cost = min(self.g.get(node, float('inf')), self.rhs.get(node, float('inf')))
+        return (cost + self.heuristics[node], cost)
+
+    # method to recompute the rhs of a node from its predecessors and queue it if it is inconsistent
+    def update_node(self, node):
+        if node != self.start:
+            best = float('inf')
+            for previous, step_cost in self.graph.incoming(node):
+                cost = self.g.get(previous, float('inf')) + step_cost
+                if cost < best:
+                    best = cost
+            self.rhs[node] = best
+        self.update_queue(node)
+
+    # method to queue an inconsistent node with its current key, or take a consistent node off the queue
+    def update_queue(self, node):
+        if self.g.get(node, float('inf')) != self.rhs.get(node, float('inf')):
+            self.queue.put(node, self.key(node))
+        elif node in self.queue:
+            self.queue.remove(node)
+
+    # method to bring the search up to date with the graph and return the shortest path and its cost
+    # returns an empty path with infinite cost when the goal cannot be reached
+    # queue and heuristics replace the queue and heuristic table for this search, so a queue and table 
+    # from the agent's new_queue and counted count what this search does into stats
+    def search(self, stats=None, queue=None, heuristics=None):
+        if heuristics is not None:
+            self.heuristics = heuristics
+        changes = self.graph.changes_since(self.version)
+        if changes is None:
+            self.reset()
+        if queue is not None:
+            # the nodes still queued from earlier searches move to the new queue without copying
+            queue.heap, queue.index, queue.count, queue.stale = self.queue.heap, self.queue.index, self.queue.count, self.queue.stale
+            self.queue = queue
+            if stats is not None:
+                stats.frontier = len(queue)
+                stats.peak_frontier = max(stats.peak_frontier, stats.frontier)
+        if changes is not None:
+            for A, B in changes:
+                self.update_node(B)
+            self.version = self.graph.version
+        if stats is not None:
+            stats.lap('setup')
+
+        inf = float('inf')
+        g = self.g
+        rhs = self.rhs
+        while not self.queue.empty() and (self.queue.peek()[1] < self.key(self.goal) or rhs.get(self.goal, inf) != g.get(self.goal, inf)):
+            node = self.queue.get()
+            if stats is not None:
+                stats.expanded += 1
+            if g.get(node, inf) > rhs.get(node, inf):
+                # overconsistent, the node got cheaper: settle it and offer the new cost to its successors
+                cost = g[node] = rhs[node]
+                for next, step_cost in self.graph.edges(node):
+                    if cost + step_cost < rhs.get(next, inf):
+                        rhs[next] = cost + step_cost
+                        self.update_queue(next)
+            else:
+                # underconsistent, the node got more expensive: forget its cost and recompute it and its successors
+                g[node] = inf
+                self.update_node(node)
+                for next, step_cost in self.graph.edges(node):
+                    self.update_node(next)
+
+        if stats is not None:
+            stats.lap('search')
+
+        cost = g.get(self.goal, inf)
+        if cost == inf:
+            return [], inf
+
+        # walk back from the goal, each time to the predecessor that offers the node its cost
+        path = [self.goal]
+        while path[-1] != self.start:
+            path.append(min(self.graph.incoming(path[-1]), key=lambda edge: g.get(edge[0], inf) + edge[1])[0])
+        path.reverse()
+        return path, cost
+
+############################################################################################################
+# End of Lifelong Planning A* (LPA*)
+############################################################################################################
+
+
+############################################################################################################
+# SMA* search tree node
+# a node of the search tree kept by sma_star_search. children holds the successors currently in memory,
+# forgotten the f values of successors that were dropped to save memory, so they can be regenerated 
+# with at least that value.
+############################################################################################################
+
+class SMANode:
+    __slots__ = ('state', 'parent', 'g', 'f', 'depth', 'children', 'forgotten', 'expanded')
+
+    # constructor
+    def __init__(self, state, parent, g, f):
+        self.state = state
+        self.parent = parent
+        self.g = g
+        self.f = f
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.children = {}
+        self.forgotten = {}
+        self.expanded = False
+
+    # method to check whether a state is this node or one of its ancestors, so paths never loop
+    def on_path(self, state):
+        node = self
+        while node is not None:
+            if node.state == state:
+                return True
+            node = node.parent
+        return False
+
+    # priority of the node on the frontier: its f before it is expanded, afterwards the cheapest f of its 
+    # forgotten successors
+    def frontier_key(self):
+        f = min(self.forgotten.values()) if self.expanded else self.f
+        return (f, -self.depth)
+
+############################################################################################################
+# End of SMA* search tree node
+############################################################################################################
+
+
+############################################################################################################
+# Simulated annealing
+# performs simulated annealing ONE TIME from start_city, using a random number generator seeded with seed.
+# Used by SimpleProblemSolvingAgent.simulated_annealing_search, it is a module level function so 
+# restarts can run on a process pool.
+############################################################################################################
+
+def simulated_annealing(graph, start_city, goal_city, T, T_min, alpha, seed):
+    rng = random.Random(seed)
+    current = start_city
+    path = [current]
+    cost = 0
+
+    # while the temperature is greater than the minimum temperature
+    while T > T_min:
+        neighbors = list(graph.neighbors(current))
+        if not neighbors:
+            break
+        next = rng.choice(neighbors)
+        if next in path and len(neighbors) > 1:
+            neighbors.remove(next)
+            next = rng.choice(neighbors)
+        
+        if next in path and len(neighbors) == 1:
+            break
+
+        next_cost = graph.cost(current, next)
+        delta = next_cost - cost
+        if delta < 0 or math.exp(-delta/T) > rng.random():
+            path.append(next)
+            cost += next_cost
+            current = next
+        if current == goal_city:
+            break
+        else:
+            T *= alpha
+        
+    if current != goal_city:
+        return [], float('inf')
+    else:
+        return path, cost
+
+# graph of the process pool worker, set once when the worker starts
+# a pool made with ProcessPoolExecutor(workers, initializer=init_annealing_worker, initargs=(graph,))
+# can be passed to simulated_annealing_search as executor and reused for every search on graph
+annealing_graph = None
+
+def init_annealing_worker(graph):
+    global annealing_graph
+    annealing_graph = graph
+
+def annealing_restart(start_city, goal_city, T, T_min, alpha, seed):
+    return simulated_annealing(annealing_graph, start_city, goal_city, T, T_min, alpha, seed)
+
+############################################################################################################
+# End of Simulated annealing
+############################################################################################################
+
+
 ############################################################################################################
 # SimpleProblemSolvingAgent class
 ############################################################################################################
 
+# every strategy of SimpleProblemSolvingAgent.search and the method that runs it
+STRATEGIES = {
+    'greedy_best_first': 'greedy_best_first_search',
+    'a_star': 'a_star_search',
+    'bidirectional_a_star': 'bidirectional_a_star_search',
+    'ch': 'contraction_hierarchy_search',
+    'distance_matrix': 'distance_matrix_search',
+    'lpa_star': 'lpa_star_search',
+    'k_shortest': 'k_shortest_search',
+    'ara_star': 'ara_star_search',
+    'sma_star': 'sma_star_search',
+    'hill_climbing': 'hill_climbing_search',
+    'simulated_annealing': 'simulated_annealing_search',
+}
+
 class SimpleProblemSolvingAgent:
 
-    # constructor takes in a graph, start city, and goal city and initializes the heuristics dictionary (distances from each city to the goal city)
+    # constructor takes in a graph, start city, and goal city and gets the heuristics dictionary (distances from each city to the goal city)
+    # the dictionary is shared with every other agent routing to the same goal and is filled in lazily as searches look cities up
+    # the start and goal can also be (latitude, longitude) tuples, which are snapped to the closest city
     def __init__(self, graph, start_city, goal_city):
-        self.start_city = start_city
-        self.goal_city = goal_city
         self.graph = graph
-        self.heuristics = {}
-        # calculate all heuristics for all cities and goal city
-        for city in self.graph.nodes():
-            self.heuristics[city] = self.graph.heuristic(self.goal_city, city)
+        self.start_city = self.snap(start_city)
+        self.goal_city = self.snap(goal_city)
+        self.heuristics = self.graph.heuristic_table(self.goal_city)
+        self.stats = None
+        self.planner = None
+        self.bound = None
+
+    # method to run a search
+    # options are passed on to the search method, e.g. search('simulated_annealing', restarts=100, workers=8)
+    # pass a SearchStats as stats to record what the search did
+    # pass a RouteCache as cache to answer repeated searches without searching again
+    def search(self, strategy, stats=None, cache=None, **options):
+        if cache is not None:
+            if stats is not None:
+                stats.begin(strategy)
+            result = cache.get(self.start_city, self.goal_city, strategy, options)
+            if result is not None:
+                if stats is not None:
+                    stats.cache_hits += 1
+                    stats.lap('search')
+                    stats.finish()
+                return result
+            result = self.search(strategy, stats, **options)
+            cache.put(self.start_city, self.goal_city, strategy, options, result)
+            return result
+        if stats is None:
+            return self.run_strategy(strategy, **options)
+        self.stats = stats
+        stats.begin(strategy)
+        try:
+            return self.run_strategy(strategy, **options)
+        finally:
+            self.stats = None
+            stats.finish()
 
     # method to call a specific search based on strategy type
-    def search(self, strategy):
-        if strategy == 'greedy_best_first':
-            return self.greedy_best_first_search()
-        elif strategy == 'a_star':
-            return self.a_star_search()
-        elif strategy == 'hill_climbing':
-            return self.hill_climbing_search()
-        elif strategy == 'simulated_annealing':
-            return self.simulated_annealing_search()
-        else:
+    # the heuristic table is looked up again first, as changing the graph (e.g. an edge getting cheaper, 
+    # which detaches the landmarks) drops the cached tables that were built for the old graph
+    def run_strategy(self, strategy, **options):
+        self.heuristics = self.graph.heuristic_table(self.goal_city)
+        method = STRATEGIES.get(strategy)
+        if method is None:
             return "Invalid strategy"
+        return getattr(self, method)(**options)
+
+    # method to turn a (latitude, longitude) tuple into the closest city, using the graph's spatial index 
+    # (see SpatialIndex.py) which is built on first use and kept on the graph as graph.spatial_index, and built
+    # again when graph.locations is replaced
+    # a tuple that is itself a node of the graph (e.g. grid (x, y) nodes) is left as it is
+    def snap(self, place):
+        if not isinstance(place, tuple) or self.graph.has_node(place):
+            return place
+        index = getattr(self.graph, 'spatial_index', None)
+        if index is None or not index.indexes(self.graph):
+            from SpatialIndex import SpatialIndex
+            index = SpatialIndex.build(self.graph)
+            self.graph.spatial_index = index
+        return index.nearest(*place)[0]
+
+    # method to create a priority queue, counting its operations when stats are being recorded
+    def new_queue(self):
+        if self.stats is None:
+            return PriorityQueue()
+        return CountingPriorityQueue(self.stats)
+
+    # method to get a heuristic table, counting its lookups when stats are being recorded
+    def counted(self, heuristics):
+        if self.stats is None:
+            return heuristics
+        return CountingHeuristics(heuristics, self.stats)
 
     ############################################################################################################
     # Greedy Best-First Search - 
@@ -183,17 +1523,28 @@ class SimpleProblemSolvingAgent:
     ############################################################################################################
     
     def greedy_best_first_search(self):
+        stats = self.stats
+        heuristics = self.counted(self.heuristics)
+
         # create a priority queue
-        frontier = [(self.heuristics[self.start_city], self.start_city)]
+        frontier = [(heuristics[self.start_city], self.start_city)]
         heapq.heapify(frontier)
         cost = 0
         came_from = {self.start_city: None}
+        if stats is not None:
+            stats.pushes += 1
+            stats.queued()
+            stats.lap('setup')
 
         # while the queue is not empty
         while frontier:
             # get the current node from the queue
             current = heapq.heappop(frontier)[1]
             closest = None
+            if stats is not None:
+                stats.pops += 1
+                stats.frontier -= 1
+                stats.expanded += 1
 
             # if the current node is the goal node, break
             if current == self.goal_city:
@@ -204,14 +1555,24 @@ class SimpleProblemSolvingAgent:
                 # if the neighbor is not in the came_from dictionary
                 if next not in came_from:
                     # if the closest node is None or the heuristic of the neighbor is less than the heuristic of the closest node, update the closest node
-                    if closest is None or self.heuristics[next] < self.heuristics[closest]:
+                    if closest is None or heuristics[next] < heuristics[closest]:
                         closest = next
                         
             # if the closest node is not None, add the closest node to the queue and the came_from dictionary
-            if closest:
-                heapq.heappush(frontier, (self.heuristics[closest], closest))
+            if closest is not None:
+                heapq.heappush(frontier, (heuristics[closest], closest))
                 came_from[closest] = current, self.graph.cost(current, closest)
+                if stats is not None:
+                    stats.pushes += 1
+                    stats.queued()
                     
+        if stats is not None:
+            stats.lap('search')
+
+        # the goal cannot be reached (or greedy choices led into a dead end)
+        if self.goal_city not in came_from:
+            return [], float('inf')
+
         # reconstruct the path from the came_from dictionary
         path = self.reconstruct_path(came_from)
         
@@ -233,13 +1594,18 @@ class SimpleProblemSolvingAgent:
     ############################################################################################################
     
     def a_star_search(self):
-        # create a priority queue
-        frontier = PriorityQueue()
+        stats = self.stats
+        heuristics = self.counted(self.heuristics)
+
+        # create a priority queue, holding at most one entry per city
+        frontier = self.new_queue()
         frontier.put(self.start_city, 0)
         came_from = {self.start_city: None}
         cost_so_far = {self.start_city: 0}
         path = []
         cost = 0
+        if stats is not None:
+            stats.lap('setup')
 
         # while the queue is not empty
         while not frontier.empty():
@@ -248,21 +1614,30 @@ class SimpleProblemSolvingAgent:
             # if the current node is the goal node, break
             if current == self.goal_city:
                 break
+            if stats is not None:
+                stats.expanded += 1
 
             # for each neighbor of the current node
-            for next in self.graph.neighbors(current):
+            for next, step_cost in self.graph.edges(current):
                 # calculate the new cost
-                new_cost = cost_so_far[current] + self.graph.cost(current, next)
+                new_cost = cost_so_far[current] + step_cost
                 # if the neighbor is not in the cost_so_far dictionary or the new cost is less than the cost in the cost_so_far dictionary
                 if next not in cost_so_far or new_cost < cost_so_far[next]:
                     # update the cost_so_far dictionary
                     cost_so_far[next] = new_cost
                     # calculate the priority of the neighbor
-                    priority = new_cost + self.heuristics[next]
-                    # add the neighbor to the queue
+                    priority = new_cost + heuristics[next]
+                    # add the neighbor to the queue, or decrease its priority if it is already queued
                     frontier.put(next, priority)
                     # add the neighbor to the came_from dictionary
-                    came_from[next] = current, self.graph.cost(current, next)
+                    came_from[next] = current, step_cost
+
+        if stats is not None:
+            stats.lap('search')
+
+        # the goal cannot be reached
+        if self.goal_city not in came_from:
+            return [], float('inf')
 
         # reconstruct the path from the came_from dictionary
         path = self.reconstruct_path(came_from)
@@ -277,6 +1652,517 @@ class SimpleProblemSolvingAgent:
     ############################################################################################################
     
     
+    ############################################################################################################
+    # Bidirectional A* search
+    # runs A* forward from the start city and backward from the goal city at the same time.
+    # Both searches use the average potential p(v) = (h_goal(v) - h_start(v)) / 2, the forward search 
+    # with +p and the backward search with -p, so they see the same consistent reduced edge costs. 
+    # With these potentials the best path found so far is optimal as soon as the smallest forward 
+    # priority plus the smallest backward priority reaches its cost.
+    # Returns an empty path with infinite cost when the goal cannot be reached.
+    ############################################################################################################
+    
+    def bidirectional_a_star_search(self):
+        if self.start_city == self.goal_city:
+            return [self.start_city], 0
+
+        stats = self.stats
+
+        # heuristics to the goal city (for the forward search) and from the start city (for the backward search)
+        to_goal = self.counted(self.heuristics)
+        to_start = self.counted(self.graph.heuristic_table(self.start_city, reverse=True))
+
+        # one priority queue, cost dictionary and parent dictionary per direction
+        forward = self.new_queue()
+        backward = self.new_queue()
+        forward.put(self.start_city, (to_goal[self.start_city] - to_start[self.start_city]) / 2)
+        backward.put(self.goal_city, (to_start[self.goal_city] - to_goal[self.goal_city]) / 2)
+        cost_from_start = {self.start_city: 0}
+        cost_to_goal = {self.goal_city: 0}
+        came_from = {self.start_city: None}
+        goes_to = {self.goal_city: None}
+
+        # cost of the best path found so far and the city where its two halves meet
+        best_cost = float('inf')
+        meeting = None
+        if stats is not None:
+            stats.lap('setup')
+
+        # while both queues have cities left
+        while not forward.empty() and not backward.empty():
+            # stop once no unexplored path can be cheaper than the best path found so far
+            if forward.peek()[1] + backward.peek()[1] >= best_cost:
+                break
+            if stats is not None:
+                stats.expanded += 1
+
+            # expand the smaller frontier
+            if len(forward) <= len(backward):
+                current = forward.get()
+                for next, step_cost in self.graph.edges(current):
+                    new_cost = cost_from_start[current] + step_cost
+                    if next not in cost_from_start or new_cost < cost_from_start[next]:
+                        cost_from_start[next] = new_cost
+                        came_from[next] = current, step_cost
+                        forward.put(next, new_cost + (to_goal[next] - to_start[next]) / 2)
+                        # if the backward search has reached the neighbor, the two halves form a path
+                        if next in cost_to_goal and new_cost + cost_to_goal[next] < best_cost:
+                            best_cost = new_cost + cost_to_goal[next]
+                            meeting = next
+            else:
+                current = backward.get()
+                for previous, step_cost in self.graph.incoming(current):
+                    new_cost = cost_to_goal[current] + step_cost
+                    if previous not in cost_to_goal or new_cost < cost_to_goal[previous]:
+                        cost_to_goal[previous] = new_cost
+                        goes_to[previous] = current, step_cost
+                        backward.put(previous, new_cost + (to_start[previous] - to_goal[previous]) / 2)
+                        # if the forward search has reached the neighbor, the two halves form a path
+                        if previous in cost_from_start and new_cost + cost_from_start[previous] < best_cost:
+                            best_cost = new_cost + cost_from_start[previous]
+                            meeting = previous
+
+        if stats is not None:
+            stats.lap('search')
+
+        if meeting is None:
+            return [], float('inf')
+
+        # join the forward half (start to meeting city) and the backward half (meeting city to goal)
+        path = [meeting]
+        current = meeting
+        while came_from[current] is not None:
+            current = came_from[current][0]
+            path.append(current)
+        path.reverse()
+        current = meeting
+        while goes_to[current] is not None:
+            current = goes_to[current][0]
+            path.append(current)
+
+        # calculate the cost of the path
+        cost = self.calculate_cost(path)
+
+        return path, cost
+
+    ############################################################################################################
+    # End of Bidirectional A* search
+    ############################################################################################################
+    
+    
+    ############################################################################################################
+    # Contraction Hierarchy search
+    # answers the query on the graph's contraction hierarchy (see ContractionHierarchy.py), which is read 
+    # from graph.hierarchy. If the graph has none yet it is built here once and kept on the graph, so later 
+    # agents on the same graph reuse it. Attach a prebuilt one with 
+    # graph.hierarchy = ContractionHierarchy.load(filename), it is taken to match the graph as it is when first
+    # used. The hierarchy remembers the graph version it belongs to and is rebuilt once edges have changed.
+    ############################################################################################################
+    
+    def contraction_hierarchy_search(self):
+        hierarchy = getattr(self.graph, 'hierarchy', None)
+        if hierarchy is not None and hierarchy.graph_version is None:
+            hierarchy.graph_version = self.graph.version
+        if hierarchy is None or hierarchy.graph_version != self.graph.version:
+            from ContractionHierarchy import ContractionHierarchy
+            hierarchy = ContractionHierarchy.build(self.graph)
+            self.graph.hierarchy = hierarchy
+
+        return hierarchy.query(self.start_city, self.goal_city, self.stats)
+
+    ############################################################################################################
+    # End of Contraction Hierarchy search
+    ############################################################################################################
+    
+    
+    ############################################################################################################
+    # Distance Matrix lookup
+    # reads the route from the graph's precomputed all-pairs matrix (see DistanceMatrix.py) instead of 
+    # searching. The matrix is too large to build implicitly, so it has to be built and attached first:
+    #     DistanceMatrix.build(graph, filename)
+    #     graph.distance_matrix = DistanceMatrix.open(filename)
+    # The matrix is taken to match the graph as it is when first used. Once edges have changed it is out of 
+    # date and has to be built again, the lookup refuses to answer from it.
+    ############################################################################################################
+    
+    def distance_matrix_search(self):
+        matrix = getattr(self.graph, 'distance_matrix', None)
+        if matrix is None:
+            raise ValueError("The graph has no distance matrix. Build one with DistanceMatrix.build and attach it as graph.distance_matrix.")
+        if matrix.graph_version is None:
+            matrix.graph_version = self.graph.version
+            matrix.integer_costs = integer_costs(self.graph)
+        if matrix.graph_version != self.graph.version:
+            raise ValueError("The graph changed since its distance matrix was attached. Build it again with DistanceMatrix.build.")
+        if self.stats is not None:
+            self.stats.lap('setup')
+
+        return matrix.path(self.start_city, self.goal_city)
+
+    ############################################################################################################
+    # End of Distance Matrix lookup
+    ############################################################################################################
+    
+    
+    ############################################################################################################
+    # LPA* search (incremental replanning)
+    # the agent keeps its LPA* state (see LPAStar) between searches. The first search costs about as much 
+    # as A*, later searches after edges were changed with graph.connect (a road closure or a traffic update)
+    # only repair the part of the search tree the changes affect.
+    ############################################################################################################
+    
+    def lpa_star_search(self):
+        # the queued keys were computed with the old table, so a new table means starting over
+        if self.planner is None or self.planner.table is not self.heuristics:
+            self.planner = LPAStar(self.graph, self.start_city, self.goal_city, self.heuristics)
+
+        return self.planner.search(self.stats, self.new_queue(), self.counted(self.heuristics))
+
+    ############################################################################################################
+    # End of LPA* search
+    ############################################################################################################
+    
+    
+    ############################################################################################################
+    # K Shortest Paths (Yen's algorithm)
+    # k_shortest_paths finds the k cheapest loopless paths from the start city to the goal city and returns 
+    # them as a list of (path, cost), cheapest first (fewer when there are not k of them, empty when the 
+    # goal cannot be reached). The 'k_shortest' strategy returns the cheapest like every other strategy.
+    # Each new path branches off an earlier one at a spur node: the root (the earlier path up to the spur
+    # node) is kept, and a spur path to the goal is searched that avoids the root's nodes and the edges the
+    # earlier paths with the same root took from the spur node.
+    # One reverse Dijkstra from the goal gives the exact cost to the goal from every city. Removing nodes 
+    # and edges can only make those costs higher, so they are a consistent A* heuristic for the spur 
+    # searches, and when the tree path from the spur node avoids everything removed it is the spur path
+    # and no search is needed at all.
+    ############################################################################################################
+    
+    def k_shortest_search(self, k=3):
+        found = self.k_shortest_paths(k)
+        if not found:
+            return [], float('inf')
+        return found[0]
+
+    # method to get the k cheapest loopless paths as a list of (path, cost), cheapest first
+    def k_shortest_paths(self, k=3):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        stats = self.stats
+        cost_to_goal, next_hop = dijkstra(self.graph, self.goal_city, reverse=True)
+        if stats is not None:
+            # the reverse Dijkstra expands every city that can reach the goal once
+            stats.expanded += len(cost_to_goal)
+            stats.lap('setup')
+        if self.start_city not in cost_to_goal:
+            return []
+
+        # the shortest path follows the tree from the start city
+        path = [self.start_city]
+        while next_hop[path[-1]] is not None:
+            path.append(next_hop[path[-1]][0])
+        found = [(path, cost_to_goal[self.start_city])]
+        candidates = []
+        seen = {tuple(path)}
+
+        while len(found) < k:
+            path, cost = found[-1]
+            root_cost = 0
+            for i in range(len(path) - 1):
+                spur = path[i]
+                root = path[:i + 1]
+                banned = set(root[:-1])
+                removed = {other[i + 1] for other, other_cost in found if len(other) > i + 1 and other[:i + 1] == root}
+
+                spur_path, spur_cost = self.spur_path(spur, banned, removed, cost_to_goal, next_hop)
+                if spur_path:
+                    candidate = root[:-1] + spur_path
+                    if tuple(candidate) not in seen:
+                        seen.add(tuple(candidate))
+                        heapq.heappush(candidates, (root_cost + spur_cost, len(seen), candidate))
+                root_cost += self.graph.cost(spur, path[i + 1])
+
+            if not candidates:
+                break
+            cost, count, path = heapq.heappop(candidates)
+            found.append((path, cost))
+
+        if stats is not None:
+            stats.lap('search')
+
+        return found
+
+    # method to find the cheapest path from spur to the goal that avoids the banned nodes and does not 
+    # take an edge from spur to a removed node, returns an empty path with infinite cost if there is none
+    def spur_path(self, spur, banned, removed, cost_to_goal, next_hop):
+        stats = self.stats
+
+        # reuse the shortest path tree when its path from spur avoids everything removed
+        path = [spur]
+        while next_hop[path[-1]] is not None:
+            next = next_hop[path[-1]][0]
+            if next in banned or (len(path) == 1 and next in removed):
+                break
+            path.append(next)
+        else:
+            return path, cost_to_goal[spur]
+
+        # otherwise A* with the tree costs as the heuristic, skipping nodes that cannot reach the goal at all
+        # the frontier count starts over, what the last spur search left queued is dropped with its queue
+        if stats is not None:
+            stats.frontier = 0
+        frontier = self.new_queue()
+        frontier.put(spur, cost_to_goal[spur])
+        came_from = {spur: None}
+        cost_so_far = {spur: 0}
+        while not frontier.empty():
+            current = frontier.get()
+            if current == self.goal_city:
+                path = [current]
+                while came_from[path[-1]] is not None:
+                    path.append(came_from[path[-1]])
+                return path[::-1], cost_so_far[current]
+            if stats is not None:
+                stats.expanded += 1
+            for next, step_cost in self.graph.edges(current):
+                if next in banned or next not in cost_to_goal or (current == spur and next in removed):
+                    continue
+                new_cost = cost_so_far[current] + step_cost
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    frontier.put(next, new_cost + cost_to_goal[next])
+
+        return [], float('inf')
+
+    ############################################################################################################
+    # End of K Shortest Paths
+    ############################################################################################################
+    
+    
+    ############################################################################################################
+    # Anytime Repairing A* (ARA*)
+    # runs weighted A* (priority g + epsilon * h), whose path costs at most epsilon times the optimal cost, 
+    # then keeps lowering epsilon by epsilon_step and improving the path until epsilon reaches 1 or the 
+    # deadline (in seconds) passes. Each improvement reuses the costs found so far: only the nodes whose 
+    # cost dropped after they were expanded (kept in incons) are queued again. The last pass (epsilon 1) 
+    # reopens such nodes straight away like a_star_search, so it returns an optimal path even though the 
+    # truncated haversine heuristic is not exactly consistent.
+    # The first path is always finished, the deadline only cuts the improvements short.
+    # After the search, self.bound holds the proven suboptimality bound of the returned path
+    # (cost <= bound * optimal cost): cost / lower bound, where the lower bound on the optimal cost is 
+    # the smallest g + h of the nodes still waiting in frontier or incons after the last completed pass.
+    ############################################################################################################
+    
+    def ara_star_search(self, deadline=None, epsilon=3.0, epsilon_step=0.5):
+        stats = self.stats
+        heuristics = self.counted(self.heuristics)
+        stop = time.perf_counter() + deadline if deadline is not None else None
+        inf = float('inf')
+
+        frontier = self.new_queue()
+        frontier.put(self.start_city, epsilon * heuristics[self.start_city])
+        came_from = {self.start_city: None}
+        cost_so_far = {self.start_city: 0}
+        closed = set()
+        incons = set()
+        finished = False
+        lower_bound = 0
+        if stats is not None:
+            stats.lap('setup')
+
+        while True:
+            # improve the path until no queued node can lead to a cheaper one with this epsilon
+            interrupted = False
+            while not frontier.empty() and frontier.peek()[1] < cost_so_far.get(self.goal_city, inf):
+                if finished and stop is not None and time.perf_counter() > stop:
+                    interrupted = True
+                    break
+                current = frontier.get()
+                closed.add(current)
+                if stats is not None:
+                    stats.expanded += 1
+                for next, step_cost in self.graph.edges(current):
+                    new_cost = cost_so_far[current] + step_cost
+                    if new_cost < cost_so_far.get(next, inf):
+                        cost_so_far[next] = new_cost
+                        came_from[next] = current, step_cost
+                        if next in closed and epsilon > 1:
+                            incons.add(next)
+                        else:
+                            frontier.put(next, new_cost + epsilon * heuristics[next])
+            if interrupted:
+                break
+
+            # the pass finished, every node that could still lead to a cheaper path is in frontier or incons
+            goal_cost = cost_so_far.get(self.goal_city, inf)
+            if goal_cost == inf:
+                break
+            finished = True
+            waiting = [cost_so_far[node] + heuristics[node] for node in list(frontier.index) + list(incons)]
+            lower_bound = max(lower_bound, min(waiting + [goal_cost]))
+            if epsilon <= 1 or goal_cost <= lower_bound or (stop is not None and time.perf_counter() > stop):
+                break
+
+            # lower epsilon and queue the waiting and inconsistent nodes again with their new priorities
+            epsilon = max(1.0, epsilon - epsilon_step)
+            for node in list(frontier.index) + list(incons):
+                frontier.put(node, cost_so_far[node] + epsilon * heuristics[node])
+            incons.clear()
+            closed.clear()
+
+        if stats is not None:
+            stats.lap('search')
+
+        if self.goal_city not in cost_so_far:
+            self.bound = 1.0
+            return [], inf
+
+        path = self.reconstruct_path(came_from)
+        cost = self.calculate_cost(path)
+        if lower_bound > 0:
+            self.bound = max(1.0, cost / lower_bound)
+        else:
+            self.bound = 1.0 if cost == 0 else inf
+        return path, cost
+
+    ############################################################################################################
+    # End of Anytime Repairing A*
+    ############################################################################################################
+    
+    
+    ############################################################################################################
+    # SMA* search (Simplified Memory-bounded A*)
+    # A* over a search tree that never holds more than max_nodes nodes. When memory is full the worst leaf 
+    # (highest f, shallowest) is forgotten and its f is remembered by its parent, which goes back on the 
+    # frontier so the leaf can be regenerated if everything else turns out to be worse. Each node's f is 
+    # backed up to the smallest f of its successors, so the tree keeps the best known estimate of every 
+    # forgotten branch.
+    # A successor is not generated when memory already holds its city reached no more expensively.
+    # Returns the cheapest path with at most max_nodes cities (the optimal path when it fits), or an empty 
+    # path with infinite cost when none fits. At most max_nodes nodes are ever in memory whatever the size
+    # of the graph, but with a max_nodes well below the number of nodes A* would keep, the same branches 
+    # are forgotten and regenerated over and over and the search slows down quickly.
+    ############################################################################################################
+    
+    def sma_star_search(self, max_nodes=10000):
+        if max_nodes < 2:
+            raise ValueError("max_nodes must be at least 2")
+        stats = self.stats
+        heuristics = self.counted(self.heuristics)
+        inf = float('inf')
+
+        root = SMANode(self.start_city, None, 0, heuristics[self.start_city])
+        # frontier holds the nodes with successors left to generate, the best (lowest f, deepest) first
+        # leaves holds the nodes with no successors in memory, the worst (highest f, shallowest) first
+        # only the frontier counts into stats, leaves keeps a second order on the same nodes
+        frontier = self.new_queue()
+        frontier.put(root, root.frontier_key())
+        leaves = PriorityQueue()
+        leaves.put(root, (-root.f, root.depth))
+        # cheapest node in memory for each city, a successor that reaches a city no cheaper is not generated
+        best = {root.state: root}
+        in_memory = 1
+        if stats is not None:
+            stats.lap('setup')
+
+        while not frontier.empty():
+            node, (f, depth) = frontier.peek()
+            if f == inf:
+                break
+            if node.state == self.goal_city:
+                if stats is not None:
+                    stats.lap('search')
+                path = []
+                cost = node.g
+                while node is not None:
+                    path.append(node.state)
+                    node = node.parent
+                return path[::-1], cost
+
+            # generate every successor that is not in memory, a regenerated one gets back its forgotten f
+            frontier.get()
+            if node in leaves:
+                leaves.remove(node)
+            node.expanded = True
+            if stats is not None:
+                stats.expanded += 1
+            for next, step_cost in self.graph.edges(node.state):
+                if next in node.children or node.on_path(next):
+                    continue
+                g = node.g + step_cost
+                other = best.get(next)
+                if other is not None and other.g <= g and other.depth <= node.depth + 1:
+                    node.forgotten.pop(next, None)
+                    continue
+                # a path through a node this deep cannot fit in memory unless the node is the goal
+                if next != self.goal_city and node.depth + 2 >= max_nodes:
+                    child_f = inf
+                else:
+                    child_f = max(node.f, g + heuristics[next], node.forgotten.get(next, 0))
+
+                # when memory is full forget the worst leaf, or the new successor itself if it is no better
+                if in_memory >= max_nodes:
+                    worst, key = leaves.peek()
+                    if node.children and (-child_f, node.depth + 1) <= key:
+                        node.forgotten[next] = child_f
+                        continue
+                    self.sma_forget(frontier, leaves, best)
+                    # the expanded node is about to get a successor again
+                    if node in leaves:
+                        leaves.remove(node)
+                    in_memory -= 1
+
+                node.forgotten.pop(next, None)
+                child = SMANode(next, node, g, child_f)
+                node.children[next] = child
+                if other is None or g < other.g:
+                    best[next] = child
+                frontier.put(child, child.frontier_key())
+                leaves.put(child, (-child.f, child.depth))
+                in_memory += 1
+
+            if not node.children:
+                leaves.put(node, (-node.f, node.depth))
+            if node.forgotten:
+                frontier.put(node, node.frontier_key())
+            self.sma_backup(node, leaves)
+
+        if stats is not None:
+            stats.lap('search')
+
+        return [], inf
+
+    # method to drop the worst leaf from memory, its parent remembers its f and goes back on the frontier
+    def sma_forget(self, frontier, leaves, best):
+        worst = leaves.get()
+        if best.get(worst.state) is worst:
+            del best[worst.state]
+        parent = worst.parent
+        del parent.children[worst.state]
+        parent.forgotten[worst.state] = worst.f
+        if worst in frontier:
+            frontier.remove(worst)
+        frontier.put(parent, parent.frontier_key())
+        if not parent.children:
+            leaves.put(parent, (-parent.f, parent.depth))
+
+    # method to set the f of a node to the smallest f of its successors and pass the change up the tree
+    def sma_backup(self, node, leaves):
+        while node is not None:
+            values = [child.f for child in node.children.values()] + list(node.forgotten.values())
+            f = min(values) if values else float('inf')
+            if f == node.f:
+                return
+            node.f = f
+            if node in leaves:
+                leaves.put(node, (-f, node.depth))
+            node = node.parent
+
+    ############################################################################################################
+    # End of SMA* search
+    ############################################################################################################
+    
+    
     ############################################################################################################
     # Hill Climbing Search 
     # move to the neighbor that offers lowest cost compared to the current node. 
@@ -291,9 +2177,14 @@ class SimpleProblemSolvingAgent:
         path = [current]
         cost = 0
         tried = []
+        stats = self.stats
+        if stats is not None:
+            stats.lap('setup')
 
         # while the current node is not the goal node
         while current != self.goal_city:
+            if stats is not None:
+                stats.expanded += 1
 
             # get the neighbors of the current node
             neighbors = list(self.graph.neighbors(current))
@@ -339,22 +2230,30 @@ class SimpleProblemSolvingAgent:
             
             # if the best neighbor exists, add the best neighbor to tried nodes
             # if there is no best neighbor, add the current node to tried nodes and set the current node to the second to last node in the path
-            if best_neighbor:
+            if best_neighbor is not None:
                 tried.append(best_neighbor)
             else:
                 tried.append(current)
+                # back at the start city with every way out tried, the goal cannot be reached
+                if len(path) == 1:
+                    break
                 current = path[-2]
                 path.pop()
                 continue
             
             # if the best neighbor exists, set the current node to the best neighbor and add the best neighbor to the path
             # if there is no best neighbor, break
-            if best_neighbor:
+            if best_neighbor is not None:
                 current = best_neighbor
                 path.append(current)
                 cost += best_cost
             else:
                 break     
+
+        if stats is not None:
+            stats.lap('search')
+        if current != self.goal_city:
+            return [], float('inf')
         return path, cost
 
     ############################################################################################################
@@ -365,67 +2264,61 @@ class SimpleProblemSolvingAgent:
     ############################################################################################################
     # Simulated Annealing Search 
     # uses probability function to determine whether to move to a neighbor or not. 
-    # Default number of iterations is 10. The higher the number of iterations, the higher the precision.
+    # Default number of restarts is 10. The higher the number of restarts, the higher the precision.
+    # Each restart runs simulated_annealing with its own random number generator, seeded from seed, 
+    # so a search with a fixed seed always returns the same result. With workers > 1 the restarts 
+    # run in parallel on a process pool (workers=None uses every core). executor is a pool to run them 
+    # on instead of starting one per search, it must have been set up with init_annealing_worker for 
+    # this graph and is left running afterwards.
+    # If lower_bound is given (e.g. a known optimal cost), the search stops at the first restart (in 
+    # restart order, also when running in parallel) that returns a cost within tolerance of it. Among 
+    # the restarts up to there the cheapest wins, ties going to the earliest restart.
     ############################################################################################################
     
-    def simulated_annealing_search(self):
-        # higher number of iterations increases precision
-        number_of_iterations = 10
-
-        # Higher T increases probability of accepting worse solutions
-        T = 100
-
-        # Lower T_min increases precision
-        T_min = 0.00001
-
-        # Rate of decrease of temperature
-        alpha = 0.9
-
-        # function to perform simulated annealing ONE TIME
-        def simulated_annealing(T, T_min, alpha):
-            current = self.start_city
-            path = [current]
-            cost = 0
-
-            # while the temperature is greater than the minimum temperature
-            while T > T_min:
-                neighbors = list(self.graph.neighbors(current))
-                next = random.choice(neighbors)
-                if next in path and len(neighbors) > 1:
-                    neighbors.remove(next)
-                    next = random.choice(neighbors)
-                
-                if next in path and len(neighbors) == 1:
-                    break
-
-                next_cost = self.graph.cost(current, next)
-                delta = next_cost - cost
-                if delta < 0 or math.exp(-delta/T) > random.random():
-                    path.append(next)
-                    cost += next_cost
-                    current = next
-                if current == self.goal_city:
+    def simulated_annealing_search(self, restarts=10, T=100, T_min=0.00001, alpha=0.9, seed=None, workers=1, lower_bound=None, tolerance=0, executor=None):
+        if restarts < 1:
+            raise ValueError("restarts must be at least 1")
+        # one seed per restart, drawn from the base seed
+        seeds = random.Random(seed).sample(range(2 ** 62), restarts)
+        results = {}
+
+        # checks whether a restart is close enough to the lower bound to stop searching
+        def good_enough(cost):
+            return lower_bound is not None and cost <= lower_bound + tolerance
+
+        stats = self.stats
+        if stats is not None:
+            stats.lap('setup')
+
+        if workers == 1 and executor is None:
+            # perform simulated annealing multiple times in this process
+            for i, restart_seed in enumerate(seeds):
+                results[i] = simulated_annealing(self.graph, self.start_city, self.goal_city, T, T_min, alpha, restart_seed)
+                if good_enough(results[i][1]):
                     break
-                else:
-                    T *= alpha
-                
-            if current != self.goal_city:
-                return path, float('inf')
-            else:
-                return path, cost
-
-        # perform simulated annealing multiple times and return the best path and cost
-        for i in range(number_of_iterations):
-            path, cost = simulated_annealing(T, T_min, alpha)
-            if i == 0:
-                best_path = path
-                best_cost = cost
-            else:
-                if cost < best_cost:
-                    best_path = path
-                    best_cost = cost
-
-        return best_path, best_cost  
+        else:
+            # perform simulated annealing multiple times on a process pool, the graph is sent once per worker
+            # results are read in restart order, so stopping early picks the same restart as above
+            pool = executor or ProcessPoolExecutor(workers, initializer=init_annealing_worker, initargs=(self.graph,))
+            futures = [pool.submit(annealing_restart, self.start_city, self.goal_city, T, T_min, alpha, restart_seed) for restart_seed in seeds]
+            try:
+                for i, future in enumerate(futures):
+                    results[i] = future.result()
+                    if good_enough(results[i][1]):
+                        break
+            finally:
+                for future in futures:
+                    future.cancel()
+                if executor is None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+
+        if stats is not None:
+            stats.expanded += len(results)
+            stats.lap('search')
+
+        # return the best path and cost
+        best = min(results, key=lambda i: (results[i][1], i))
+        return results[best]
 
     ############################################################################################################
     # End of Simulated Annealing Search
@@ -475,11 +2368,80 @@ class SimpleProblemSolvingAgent:
     
 
 
+############################################################################################################
+# Batch routing
+# routes many (start, goal) pairs and yields (start, goal, path, cost) for each of them.
+# Pairs are read batch_size at a time so any iterable (a file, a generator) can be streamed. Within a 
+# batch, queries are grouped:
+#     - for the optimal strategies ('a_star' and 'bidirectional_a_star') pairs sharing a start city are 
+#       answered from one Dijkstra tree that stops once all of their goals are reached
+#     - the remaining pairs are run goal by goal, so their agents share the goal's cached heuristic table
+# Results of a batch are therefore yielded grouped, not in input order. Unreachable goals get an empty 
+# path with infinite cost whichever way they are answered.
+############################################################################################################
 
+def route_many(graph, pairs, strategy='a_star', batch_size=10000):
+    tree_strategies = ('a_star', 'bidirectional_a_star')
+    pairs = iter(pairs)
+
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            return
+
+        # group the queries by start city
+        by_start = {}
+        for start_city, goal_city in batch:
+            by_start.setdefault(start_city, []).append(goal_city)
+
+        # answer start cities with several goals from one shortest path tree
+        by_goal = {}
+        for start_city, goals in by_start.items():
+            if strategy in tree_strategies and len(goals) > 1:
+                routes = one_to_many(graph, start_city, goals)
+                for goal_city in goals:
+                    path, cost = routes[goal_city]
+                    yield start_city, goal_city, path, cost
+            else:
+                for goal_city in goals:
+                    by_goal.setdefault(goal_city, []).append(start_city)
 
+        # run the rest goal by goal so each goal's heuristic table is reused while it is hot
+        for goal_city, starts in by_goal.items():
+            for start_city in starts:
+                path, cost = SimpleProblemSolvingAgent(graph, start_city, goal_city).search(strategy)
+                yield start_city, goal_city, path, cost
 
+############################################################################################################
+# End of Batch routing
+############################################################################################################
 
 
+############################################################################################################
+# One-to-many and isochrone queries
+# both run a single Dijkstra from the source instead of one search per destination.
+############################################################################################################
 
+# returns {target: (path, cost)} for every target, found with one Dijkstra that stops once every target
+# is settled or the cost passes max_cost. Targets it does not reach get an empty path with infinite cost.
+# Without targets every node within max_cost (or every reachable node) is returned.
+def one_to_many(graph, source, targets=None, max_cost=None):
+    cost_so_far, came_from = dijkstra(graph, source, targets=targets, max_cost=max_cost)
+    if targets is None:
+        targets = cost_so_far
+    routes = {}
+    for target in targets:
+        if target in cost_so_far:
+            routes[target] = path_from_tree(came_from, target), cost_so_far[target]
+        else:
+            routes[target] = [], float('inf')
+    return routes
 
+# returns {node: cost} for every node that can be reached from the source within budget
+# with reverse=True it is every node that can reach the source within budget instead
+def isochrone(graph, source, budget, reverse=False):
+    return dijkstra(graph, source, reverse=reverse, max_cost=budget)[0]
 
+############################################################################################################
+# End of One-to-many and isochrone queries
+############################################################################################################
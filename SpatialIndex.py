@@ -0,0 +1,133 @@
+import heapq
+from math import radians, sin, cos
+from array import array
+from SimpleProblemSolvingAgent import haversine
+
+############################################################################################################
+# This file contains the SpatialIndex class which finds the nodes of a graph closest to a latitude and
+# longitude, so routes can start and end at GPS points instead of node names.
+#
+# Every location is turned into a point on the unit sphere (x, y, z). The straight line distance between
+# two such points grows with the great circle distance, so the nearest points in 3D are the nearest
+# locations on the map, with no trouble at the poles or where longitudes wrap around.
+#
+# The points are kept in a balanced KD-tree stored in flat arrays: the node of the range [lo, hi) is the
+# point at mid = (lo + hi) // 2, which splits the range on axis depth % 3. A query walks down towards the
+# point and only visits the other side of a split when it could hold something closer, so nearest and
+# k_nearest take about log(n) steps.
+#
+# Usage example:
+#     index = SpatialIndex.build(romania_map)
+#     index.nearest(45.8, 24.1)          # ('Sibiu', 3.5...)
+#     index.k_nearest(45.8, 24.1, 3)     # [('Sibiu', 3.5...), ('Fagaras', 67.8...), ('Rimnicu', 80.6...)]
+############################################################################################################
+
+
+# point on the unit sphere of a latitude and longitude
+def unit_vector(latitude, longitude):
+    phi, lam = radians(latitude), radians(longitude)
+    return cos(phi) * cos(lam), cos(phi) * sin(lam), sin(phi)
+
+# coordinates of a graph: the latitudes of a CompactGraph or the locations of a Graph, None if it has none
+def graph_coordinates(graph):
+    if hasattr(graph, 'latitudes'):
+        return graph.latitudes
+    return getattr(graph, 'locations', None)
+
+
+############################################################################################################
+# SpatialIndex class
+############################################################################################################
+
+class SpatialIndex:
+    # constructor takes the nodes and their latitudes and longitudes, in the same order
+    def __init__(self, nodes, latitudes, longitudes):
+        points = [(unit_vector(latitude, longitude), node, latitude, longitude)
+                  for node, latitude, longitude in zip(nodes, latitudes, longitudes)]
+
+        # sort each range on its split axis and place its median at mid, then do the same for both halves
+        stack = [(0, len(points), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo < 2:
+                continue
+            axis = depth % 3
+            points[lo:hi] = sorted(points[lo:hi], key=lambda point: point[0][axis])
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+        self.nodes = [point[1] for point in points]
+        self.points = array('d', [value for point in points for value in point[0]])
+        self.locations = [(point[2], point[3]) for point in points]
+        # coordinates the index was built from (see graph_coordinates), set by build
+        self.source = None
+
+    # method to build the index of a graph's locations, nodes without a location are left out
+    @classmethod
+    def build(cls, graph):
+        source = graph_coordinates(graph)
+        if source is None or len(source) == 0:
+            raise ValueError("The graph has no coordinates to build a spatial index from")
+        if hasattr(graph, 'latitudes'):
+            nodes = [node for node in graph.nodes() if graph.latitudes[node] == graph.latitudes[node]]
+            index = cls(nodes, [graph.latitudes[node] for node in nodes], [graph.longitudes[node] for node in nodes])
+        else:
+            index = cls(list(source), [location[0] for location in source.values()], [location[1] for location in source.values()])
+        index.source = source
+        return index
+
+    # method to check whether the index is still the one of a graph's coordinates, it is not once
+    # graph.locations was replaced with another dict
+    def indexes(self, graph):
+        return self.source is graph_coordinates(graph)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    # method to get the node closest to a latitude and longitude and its distance in km
+    def nearest(self, latitude, longitude):
+        found = self.k_nearest(latitude, longitude, 1)
+        if not found:
+            raise ValueError("The spatial index is empty")
+        return found[0]
+
+    # method to get the k nodes closest to a latitude and longitude with their distances in km, closest first
+    def k_nearest(self, latitude, longitude, k):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        x, y, z = query = unit_vector(latitude, longitude)
+        points = self.points
+        # max heap (negated squared distances) of the k closest points found so far
+        best = []
+        stack = [(0, len(self.nodes), 0, 0.0)]
+
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            # the range lies at least sqrt(bound) away, skip it if k closer points are already known
+            if lo >= hi or (len(best) == k and bound >= -best[0][0]):
+                continue
+            mid = (lo + hi) // 2
+            px, py, pz = points[3 * mid], points[3 * mid + 1], points[3 * mid + 2]
+            distance = (x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2
+            if len(best) < k:
+                heapq.heappush(best, (-distance, mid))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, mid))
+
+            axis = depth % 3
+            difference = query[axis] - points[3 * mid + axis]
+            if difference < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            # the far side is pushed first so the near side is searched first
+            stack.append((far[0], far[1], depth + 1, max(bound, difference * difference)))
+            stack.append((near[0], near[1], depth + 1, bound))
+
+        found = sorted((-distance, i) for distance, i in best)
+        return [(self.nodes[i], haversine((latitude, longitude), self.locations[i])) for distance, i in found]
+
+############################################################################################################
+# End of SpatialIndex class
+############################################################################################################
@@ -0,0 +1,44 @@
+import random
+from SimpleProblemSolvingAgent import Graph, UndirectedGraph, SimpleProblemSolvingAgent, Landmarks, dijkstra, route_many
+
+############################################################################################################
+# Tests of SimpleProblemSolvingAgent searches, run with: python3 -m pytest
+############################################################################################################
+
+
+# random connected graph without locations, so the landmarks are its only heuristic
+def random_graph(n, seed):
+    rng = random.Random(seed)
+    graph_dict = {node: {} for node in range(n)}
+    for node in range(1, n):
+        graph_dict[node][rng.randrange(node)] = rng.randint(1, 50)
+    for _ in range(2 * n):
+        a, b = rng.sample(range(n), 2)
+        graph_dict[min(a, b)][max(a, b)] = rng.randint(1, 50)
+    return UndirectedGraph(graph_dict)
+
+# an edge getting cheaper detaches the landmarks, replanning must not keep using their old estimates
+def test_replan_after_cheaper_edge_with_landmarks():
+    for seed in range(5):
+        rng = random.Random(seed)
+        graph = random_graph(60, seed)
+        graph.use_landmarks(Landmarks.build(graph, k=4))
+        agents = [SimpleProblemSolvingAgent(graph, *rng.sample(range(60), 2)) for _ in range(5)]
+        for agent in agents:
+            agent.search('lpa_star')
+        for _ in range(20):
+            a, b = rng.sample(range(60), 2)
+            graph.connect(a, b, rng.randint(1, 5))
+            for agent in agents:
+                optimal = dijkstra(graph, agent.start_city, targets=[agent.goal_city])[0][agent.goal_city]
+                assert agent.search('lpa_star')[1] == optimal
+                assert agent.search('a_star')[1] == optimal
+
+# an unreachable pair gets an empty path with infinite cost, from a Dijkstra tree or from its own search
+def test_route_many_unreachable_pairs():
+    graph = Graph({'A': {'D': 1}, 'C': {'D': 2}, 'B': {'A': 1}})
+    for strategy in ('a_star', 'bidirectional_a_star', 'greedy_best_first', 'simulated_annealing'):
+        routes = {(start, goal): (path, cost) for start, goal, path, cost in route_many(graph, [('A', 'B'), ('A', 'D'), ('C', 'B')], strategy)}
+        assert routes[('A', 'B')] == ([], float('inf'))
+        assert routes[('C', 'B')] == ([], float('inf'))
+        assert routes[('A', 'D')] == (['A', 'D'], 1)